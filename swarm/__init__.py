@@ -1,6 +1,7 @@
 from .swarm import Swarm
+from .vector_swarm import VectorSwarm
 from .simulation import Simulator
 from . import agents
 from . import world
 from .debugger import Debugger
-from .recording import VideoRecorder, DummyRecorder, DummyDataRecorder, BasicDataRecorder, DATA_RECORDER_LIST, AgentDataRecorder
+from .recording import VideoRecorder, OfflineVideoRecorder, DummyRecorder, DummyDataRecorder, BasicDataRecorder, DATA_RECORDER_LIST, AgentDataRecorder, StreamDataRecorder, StoreDataRecorder
@@ -7,12 +7,13 @@ import signal
 import networkx as nx
 from random import seed
 
-from .world import World, WorldGenerator
+from .world import World, WorldGenerator, DistanceCache
 from .agents import random_agent_generator
-from . import VideoRecorder, DummyRecorder, DummyDataRecorder, BasicDataRecorder, DATA_RECORDER_LIST
-from . import Swarm
+from . import VideoRecorder, OfflineVideoRecorder, DummyRecorder, DummyDataRecorder, BasicDataRecorder, AgentDataRecorder, StreamDataRecorder, StoreDataRecorder, DATA_RECORDER_LIST
+from . import Swarm, VectorSwarm
 from . import Simulator
 from . import Debugger
+from .script import load_script, ScriptError, REQUIRED_FUNCTIONS
 
 
 def args():
@@ -38,6 +39,9 @@ def args():
                               help="The seed for the autogeneration",
                               nargs=1, metavar="seed", type=int,
                               default=seed())
+    subparse_run.add_argument("--agent-seed",
+                              help="The master seed for the agents (default: random)",
+                              metavar="seed", type=int)
     subparse_run.add_argument("--delay",
                               help="The delay between each turn in the simulation (used together with display)",
                               nargs=1, metavar="delay", type=float, default=-1)
@@ -49,6 +53,15 @@ def args():
     subparse_run.add_argument("-s", "--swarm",
                               help="The size of the swarm",
                               nargs=1, metavar="size", type=int, required=True)
+    subparse_run.add_argument("--offline-render",
+                              help="Only log the state of the world during the simulation, and render the video afterwards with this many processes (used together with record)",
+                              metavar="workers", type=int)
+    subparse_run.add_argument("--headless",
+                              help="Run without display, recording and delay (plotting code is never imported)",
+                              action="store_true")
+    subparse_run.add_argument("--vectorized",
+                              help="Use the struct of arrays swarm engine, moving all agents in a batch",
+                              action="store_true")
 
     subparse_run.set_defaults(func=main)
 
@@ -60,9 +73,90 @@ def args():
     group.add_argument("--get-example",
                        help="Get a example script", action="store_true")
     subparse_scripts.add_argument("--debug", help="Debug a result", nargs=1, type=str, default=None)
+    subparse_scripts.add_argument("--headless",
+                                  help="Run without display, recording and delay (plotting code is never imported)",
+                                  action="store_true")
+    subparse_scripts.add_argument("--agent-seed",
+                                  help="The master seed for the agents (default: random)",
+                                  metavar="seed", type=int)
 
     subparse_scripts.set_defaults(func=scripts)
 
+    subparse_replicate = subparsers.add_parser("replicate", help="Run replicates of a script with different agent seeds")
+    subparse_replicate.add_argument("-l", "--load", help="Script to load",
+                                    metavar="filename", type=str, required=True)
+    subparse_replicate.add_argument("-n", "--replicates",
+                                    help="The number of replicates",
+                                    metavar="count", type=int, default=30)
+    subparse_replicate.add_argument("--first-seed",
+                                    help="The agent seed of the first replicate, the following replicates use the next seeds",
+                                    metavar="seed", type=int, default=0)
+    subparse_replicate.add_argument("-w", "--workers",
+                                    help="The number of worker processes",
+                                    metavar="count", type=int,
+                                    default=os.cpu_count())
+    subparse_replicate.add_argument("--store",
+                                    help="Add the results to a SQLite result store, the seeds already in it is skipped",
+                                    metavar="filename", type=str)
+    subparse_replicate.add_argument("--checkpoint",
+                                    help="The maximum number of replicates between the saves of a worker",
+                                    metavar="count", type=int, default=100)
+
+    subparse_replicate.set_defaults(func=replicates)
+
+    subparse_sweep = subparsers.add_parser("sweep", help="Run a parameter sweep from a grid")
+    group = subparse_sweep.add_mutually_exclusive_group(required=True)
+    group.add_argument("-g", "--grid", help="The grid of the sweep (YAML)",
+                       metavar="filename", type=str)
+    group.add_argument("--get-example",
+                       help="Get a example grid", action="store_true")
+    subparse_sweep.add_argument("-w", "--workers",
+                                help="The number of worker processes",
+                                metavar="count", type=int,
+                                default=os.cpu_count())
+    subparse_sweep.add_argument("--out",
+                                help="Save the result of every replicate to a CSV file",
+                                metavar="filename", type=str)
+    subparse_sweep.add_argument("--store",
+                                help="Add the results to a SQLite result store, the replicates already in it is skipped",
+                                metavar="filename", type=str)
+    subparse_sweep.add_argument("--checkpoint",
+                                help="The maximum number of replicates between the saves of a worker",
+                                metavar="count", type=int, default=100)
+
+    subparse_sweep.set_defaults(func=sweeps)
+
+    subparse_search = subparsers.add_parser("search", help="Search the best taus of the simple agents in a grid with successive halving")
+    subparse_search.add_argument("-g", "--grid", help="The grid of the search (YAML), see sweep --get-example",
+                                 metavar="filename", type=str, required=True)
+    subparse_search.add_argument("-m", "--metric", help="The metric to minimize",
+                                 choices=["turns", "distance"], default="turns")
+    subparse_search.add_argument("--eta",
+                                 help="Only the best 1/eta of the candidates is kept in each rung",
+                                 metavar="eta", type=int, default=3)
+    subparse_search.add_argument("--min-replicates",
+                                 help="The number of replicates in the first rung",
+                                 metavar="count", type=int, default=2)
+    subparse_search.add_argument("-w", "--workers",
+                                 help="The number of worker processes",
+                                 metavar="count", type=int,
+                                 default=os.cpu_count())
+    subparse_search.add_argument("--store",
+                                 help="Add the results to a SQLite result store, the replicates already in it is reused",
+                                 metavar="filename", type=str)
+    subparse_search.add_argument("--checkpoint",
+                                 help="The maximum number of replicates between the saves of a worker",
+                                 metavar="count", type=int, default=100)
+
+    subparse_search.set_defaults(func=search)
+
+    subparse_convert = subparsers.add_parser("convert", help="Convert a YAML result file with agent history to a binary trajectory file")
+    subparse_convert.add_argument("results", help="The YAML result file", metavar="filename", type=str)
+    subparse_convert.add_argument("-o", "--out", help="The trajectory file (default: the result file with .npz)",
+                                  metavar="filename", type=str)
+
+    subparse_convert.set_defaults(func=convert)
+
     subparse_tsp = subparsers.add_parser("tsp", help="Solve the traveling salesman problem")
     subparse_tsp.add_argument("-n", "--nodes",
                               help="The minmum and maximum number of nodes in the world",
@@ -83,6 +177,13 @@ def args():
     subparse_tsp.add_argument("--out",
                               help="Save the result to file",
                               metavar="filename", type=str)
+    subparse_tsp.add_argument("--cache",
+                              help="Directory for caching the distance matrices of the world (default: $SWARM_CACHE_DIR)",
+                              metavar="directory", type=str,
+                              default=os.environ.get("SWARM_CACHE_DIR"))
+    subparse_tsp.add_argument("--cache-size",
+                              help="The maximum size of the cache in MB",
+                              metavar="size", type=float, default=1024)
     group = subparse_tsp.add_mutually_exclusive_group(required=True)
     group.add_argument("--christofides", help="Solve TSP with chrisofides, approximation solution", action="store_true")
     group.add_argument("--traveling_salesman_problem", help="Find the shortest path", action="store_true")
@@ -128,14 +229,21 @@ def main(args, unknown):
 
     world = world_generator.generate()
 
-    gen = random_agent_generator()
+    gen = random_agent_generator(seed=args.agent_seed)
     generators = [[args.swarm, gen]]
-    swarm = Swarm(generators)
+    if args.vectorized:
+        swarm = VectorSwarm(generators, seed=args.agent_seed)
+    else:
+        swarm = Swarm(generators)
     swarm.set_positions(0)
 
     recorder = DummyRecorder()
-    if args.record is not None:
-        recorder = VideoRecorder(args.delay)
+    if args.record is not None and not args.headless:
+        if args.offline_render is not None:
+            recorder = OfflineVideoRecorder(args.delay if args.delay > 0 else 1,
+                                            args.record, args.offline_render)
+        else:
+            recorder = VideoRecorder(args.delay, args.record)
 
     data_recorder = DummyDataRecorder()
 
@@ -144,12 +252,13 @@ def main(args, unknown):
 
     sim = Simulator(world,
                     display=args.delay != -1,
-                    speed=args.delay, recording=recorder)
+                    speed=args.delay, recording=recorder,
+                    headless=args.headless, data_recorder=data_recorder)
     sim.start(swarm)
 
     summary(sim, swarm, data_recorder)
 
-    if args.record is not None:
+    if args.record is not None and not args.headless:
         recorder.save(args.record)
 
     return 0
@@ -178,78 +287,67 @@ def scripts(args, unknown):
     """ The main function when using scripts """
 
     if args.debug is not None:
-        import importlib.machinery as imp
-        import yaml
-        script = args.load[0]
-        script_module_loader = imp.SourceFileLoader("script", script)
-        script_module = script_module_loader.load_module()
-
-        if not hasattr(script_module, "world_generation"):
-            logging.fatal("The script is missing the function world_generation, to generate the world")
+        from .trajectory import load_results
+        from .replay import ReplayIndex
+        try:
+            script_module = load_script(args.load[0], required={
+                "world_generation": REQUIRED_FUNCTIONS["world_generation"]})
+        except ScriptError as e:
+            logging.fatal(str(e))
             return 1
 
         world = script_module.world_generation()
 
-        with open(args.debug[0], "r") as f:
-            info = yaml.load(f)
+        trajectory = load_results(args.debug[0])
+        replay = ReplayIndex.cached(args.debug[0], trajectory, world.size())
 
-        debugger = Debugger(world, info)
+        debugger = Debugger(world, trajectory, replay)
         debugger.cmdloop()
     elif args.load is not None:
         global sim
         signal.signal(signal.SIGINT, interrupt_sim)
-        import importlib.machinery as imp
 
         logging.root.setLevel(logging.INFO)
         logging.info(f"Runtime arguments f{args}")
         script = args.load[0]
-        if os.path.exists(script):
-            logging.info(f"Loading {script}")
-            script_module_loader = imp.SourceFileLoader("script", script)
-            script_module = script_module_loader.load_module()
-
-            if hasattr(script_module, "args"):
-                script_module.args(unknown)
-            else:
-                if len(unknown) != 0:
-                    logging.fatal(f"Unknown args {unknown}")
-                    return 1
-
-            if not hasattr(script_module, "world_generation"):
-                logging.fatal("The script is missing the function world_generation, to generate the world")
-                return 1
-            elif not hasattr(script_module, "agent_generator_list"):
-                logging.fatal("The script is missing the function agent_generator_list, to generate list of geneators for the swarm")
-                return 1
-            elif not hasattr(script_module, "get_sim_args"):
-                logging.fatal("The script is missing the function get_sim_args, to get the arguments to the simulation")
-                return 1
-
-            world = script_module.world_generation()
-            gen_list = script_module.agent_generator_list()
-            sim_args = script_module.get_sim_args()
-            recorder = DummyRecorder()
-            recorder_filename = None
-            save_data = DummyDataRecorder()
-            if hasattr(script_module, "get_video_recorder"):
-                recorder, recorder_filename = script_module.get_video_recorder()
-            if hasattr(script_module, "get_data_recorder"):
-                save_data = script_module.get_data_recorder()
-
-            swarm = Swarm(gen_list)
-            swarm.set_positions(0)
+        if args.agent_seed is not None:
+            # Agents created without a seed draw theirs from the global
+            # random module
+            seed(args.agent_seed)
+
+        logging.info(f"Loading {script}")
+        try:
+            script_module = load_script(script, unknown)
+        except ScriptError as e:
+            logging.fatal(str(e))
+            return 1
 
-            sim = Simulator(world, recording=recorder, **sim_args)
-            sim.start(swarm)
+        world = script_module.world_generation()
+        gen_list = script_module.agent_generator_list()
+        sim_args = script_module.get_sim_args()
+        recorder = DummyRecorder()
+        recorder_filename = None
+        save_data = DummyDataRecorder()
+        if hasattr(script_module, "get_video_recorder"):
+            recorder, recorder_filename = script_module.get_video_recorder()
+        if hasattr(script_module, "get_data_recorder"):
+            save_data = script_module.get_data_recorder()
+
+        swarm = Swarm(gen_list)
+        swarm.set_positions(0)
+
+        if args.headless:
+            sim_args["headless"] = True
+            recorder_filename = None
 
-            summary(sim, swarm, save_data)
+        sim = Simulator(world, recording=recorder, data_recorder=save_data,
+                        **sim_args)
+        sim.start(swarm)
 
-            if recorder_filename is not None:
-                recorder.save(recorder_filename)
+        summary(sim, swarm, save_data)
 
-        else:
-            logging.fatal(f"Could not find {script}")
-            return 1
+        if recorder_filename is not None:
+            recorder.save(recorder_filename)
     elif args.get_example:
 
         from .example import get_example
@@ -257,6 +355,129 @@ def scripts(args, unknown):
         sys.stdout.write(get_example())
 
 
+def replicates(args, unknown):
+    """ Run replicates of a script in a process pool """
+    logging.root.setLevel(logging.WARNING)
+    seeds = list(range(args.first_seed, args.first_seed + args.replicates))
+
+    try:
+        results = Simulator.replicate(args.load, seeds, args.workers, unknown,
+                                     args.store, args.checkpoint)
+    except ScriptError as e:
+        logging.fatal(str(e))
+        return 1
+
+    for result in results:
+        print()
+        print(result)
+
+    print()
+    print(f"Replicates: {len(results)}")
+    if not results:
+        return 0
+
+    turns = [r.result.turns for r in results]
+    discovered = [sum(r.result.discovered) for r in results]
+    distance = [r.summary.mean for r in results]
+    print(f"Mean turns: {sum(turns) / len(turns)}")
+    print(f"Mean discovered: {sum(discovered) / len(discovered)}")
+    print(f"Mean traveled distance: {sum(distance) / len(distance)}")
+
+    return 0
+
+
+def sweeps(args, unknown):
+    """ Run a parameter sweep """
+    if args.get_example:
+        from .example import get_sweep_example
+
+        sys.stdout.write(get_sweep_example())
+        return 0
+
+    from .sweep import SweepGrid, sweep
+
+    logging.root.setLevel(logging.WARNING)
+    try:
+        grid = SweepGrid.load(args.grid)
+    except (OSError, ValueError) as e:
+        logging.fatal(str(e))
+        return 1
+
+    logging.warning(f"Running {len(grid)} simulations")
+    results = sweep(grid, args.workers, args.store, args.checkpoint)
+
+    configurations = {}
+    for result in results:
+        key = (str(result.world), str(result.agent))
+        configurations.setdefault(key, []).append(result)
+
+    for (world, agent), replicate_results in configurations.items():
+        turns = [r.result.turns for r in replicate_results]
+        discovered = [sum(r.result.discovered) for r in replicate_results]
+        distance = [r.summary.mean for r in replicate_results]
+        print(f"World {world}")
+        print(f"Agents {agent}")
+        print(f"\tMean turns: {sum(turns) / len(turns)}")
+        print(f"\tMean discovered: {sum(discovered) / len(discovered)}")
+        print(f"\tMean traveled distance: {sum(distance) / len(distance)}")
+
+    if args.out is not None:
+        import csv
+        with open(args.out, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["nodes", "edge_multiplier", "edge_cost", "world_seed",
+                             "agent", "count", "tau_1", "tau_2", "tau_3",
+                             "agent_seed", "world_nodes", "turns", "discovered",
+                             "mean_travel_distance"])
+            for r in results:
+                writer.writerow([r.world["nodes"], r.world["edge_multiplier"],
+                                 r.world["edge_cost"], r.world["seed"],
+                                 r.agent["agent"], r.agent["count"],
+                                 r.agent.get("tau_1"), r.agent.get("tau_2"),
+                                 r.agent.get("tau_3"), r.seed, r.result.nodes,
+                                 r.result.turns, sum(r.result.discovered),
+                                 r.summary.mean])
+
+    return 0
+
+
+def search(args, unknown):
+    """ Search the best taus with successive halving """
+    from .sweep import SweepGrid
+    from .search import successive_halving
+
+    logging.root.setLevel(logging.WARNING)
+    try:
+        grid = SweepGrid.load(args.grid)
+        survivors = successive_halving(grid, args.metric, args.eta,
+                                       args.min_replicates, args.workers,
+                                       args.store, args.checkpoint)
+    except (OSError, ValueError) as e:
+        logging.fatal(str(e))
+        return 1
+
+    for count, candidates in survivors.items():
+        print(f"Swarm size {count}")
+        for candidate in candidates:
+            print(f"\t{candidate}")
+
+    return 0
+
+
+def convert(args, unknown):
+    """ Convert a YAML result file to a trajectory file """
+    from .trajectory import load_results
+
+    out = args.out
+    if out is None:
+        out = os.path.splitext(args.results)[0] + ".npz"
+
+    load_results(args.results).save(out)
+    print(f"Saved the trajectory to {out}")
+
+    return 0
+
+
 def TSP(args, unknown):
     """ Solve the travel salesman problem """
     logging.root.setLevel(logging.INFO)
@@ -266,30 +487,34 @@ def TSP(args, unknown):
                                      args.edge_cost, args.seed)
 
     world = world_generator.generate()
-    world.full_connected()
+    if args.cache is not None:
+        world.set_distance_cache(DistanceCache(args.cache,
+                                               int(args.cache_size * 2**20)))
+
     world.switch()
+    connected_map = world.full_connected()
 
     if args.christofides:
-        path = nx.approximation.traveling_salesman_problem(world._map)
+        path = nx.approximation.traveling_salesman_problem(connected_map)
     elif args.traveling_salesman_problem:
-        path = nx.approximation.traveling_salesman_problem(world._map)
+        path = nx.approximation.traveling_salesman_problem(connected_map)
         pass
     elif args.greedy_tsp:
-        path = nx.approximation.greedy_tsp(world._map)
+        path = nx.approximation.greedy_tsp(connected_map)
     elif args.asadpour_tsp:
-        path = nx.approximation.all_pairs_node_connectivity(world._map)
+        path = nx.approximation.all_pairs_node_connectivity(connected_map)
     
     op_path = None
     if args.simulated_annealing_tsp is not None:
         temp, max_itr, N_inner, alpha = args.simulated_annealing_tsp
-        op_path = nx.approximation.simulated_annealing_tsp(world._map, path,
+        op_path = nx.approximation.simulated_annealing_tsp(connected_map, path,
                                                            temp=int(temp),
                                                            max_iterations=int(max_itr),
                                                            N_inner=int(N_inner),
                                                            alpha=float(alpha))
     elif args.threshold_accepting_tsp is not None:
         thres, max_itr, N_inner, alpha = args.simulated_annealing_tsp
-        op_path = nx.approximation.threshold_accepting_tsp(world._map, path,
+        op_path = nx.approximation.threshold_accepting_tsp(connected_map, path,
                                                            thres=int(thres),
                                                            max_iterations=int(max_itr),
                                                            N_inner=int(N_inner),
@@ -1,16 +1,17 @@
 """ The interface for a swarm agent """
 import random as rnd
-import time
 
 
 class AgentInterface():
     """ Interface class for a swarm agent """
 
-    def __init__(self, conf: dict, position: int):
+    def __init__(self, conf: dict, position: int, seed: int = None):
         """ Create the agent
 
         :conf: The configuration of agent
         :position: The starting position of the agent
+        :seed: The seed of the private random generator of the agent
+               (None draws it from the global random module)
 
         """
         if conf is not None:
@@ -25,12 +26,9 @@ class AgentInterface():
         self._position = position
         self._traveled_distance = 0
 
-        state = rnd.getstate()
-
-        rnd.seed(time.time())
-        self._rnd_state = rnd.getstate()
-
-        rnd.setstate(state)
+        if seed is None:
+            seed = rnd.getrandbits(64)
+        self._rnd = rnd.Random(seed)
 
         self._history = []
 
@@ -57,11 +55,14 @@ class AgentInterface():
 
         self._record.append(information)
 
-    def switch_state(self):
-        """ Switch random state """
-        state = rnd.getstate()
-        rnd.setstate(self._rnd_state)
-        self._rnd_state = state
+    def pop_records(self) -> list:
+        """ Get the records since the last call and forget them
+
+        :returns: The records
+
+        """
+        records, self._record = self._record, []
+        return records
 
     @property
     def position(self) -> int:
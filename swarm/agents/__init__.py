@@ -1,4 +1,5 @@
 """ The different agents """
 from .AgentInterface import AgentInterface
+from .movement import MovementLog
 from .random_agent import RandomAgent, random_agent_generator
 from .simple_agent import SimpleAgent, simple_agent_generator
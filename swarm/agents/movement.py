@@ -0,0 +1,67 @@
+""" The movements of the agents in a turn """
+import numpy as np
+
+
+class MovementLog(list):
+
+    """ The movements of the agents already moved in the current turn
+
+        It is a list of [old, new] positions (the updated_pos given to
+        AgentInterface.move), which also keeps the live number of agents at
+        every node. The occupancy starts as the number of agents in the
+        world and is updated each time a movement is appended.
+    """
+
+    def __init__(self, world):
+        """ Create an empty log
+
+        :world: The world
+
+        """
+        list.__init__(self)
+        self._occupancy = world.occupancy()
+
+    @property
+    def occupancy(self) -> np.ndarray:
+        """ The live number of agents at every node (may be negative) """
+        return self._occupancy
+
+    def append(self, movement) -> None:
+        """ Add the movement of an agent
+
+        :movement: The old and new position
+
+        """
+        old, new = movement
+        self._occupancy[old] -= 1
+        self._occupancy[new] += 1
+        list.append(self, movement)
+
+    def extend(self, movements) -> None:
+        """ Add the movement of agents
+
+        :movements: Iterable of old and new positions
+
+        """
+        for movement in movements:
+            self.append(movement)
+
+    def extend_many(self, old: np.ndarray, new: np.ndarray) -> None:
+        """ Add the movement of many agents
+
+        :old: The old positions
+        :new: The new positions
+
+        """
+        np.subtract.at(self._occupancy, old, 1)
+        np.add.at(self._occupancy, new, 1)
+        list.extend(self, np.stack((old, new), axis=1).tolist())
+
+    def agents(self, nodes) -> list:
+        """ Get the live number of agents at nodes, clamped at zero
+
+        :nodes: The node ids
+        :returns: The number of agents at each node
+
+        """
+        return np.maximum(self._occupancy[nodes], 0).tolist()
@@ -17,25 +17,25 @@ class RandomAgent(AgentInterface):
         :returns: The new node it would move to
 
         """
-        self.switch_state()
         canndidates = world.connected(self.position)
-        new_position = rnd.choice(canndidates)
+        new_position = self._rnd.choice(canndidates)
 
         self.traveled_distance += world.cost(self.position, new_position)
         self.position = new_position
-        self.switch_state()
         return self._position
 
 
-def random_agent_generator(conf=None) -> Callable:
+def random_agent_generator(conf=None, seed=None) -> Callable:
     """ Create a random agent generator
 
     :conf: Agent configuration
+    :seed: Master seed for the agents (None uses the global random module)
     :returns: A generator function
 
     """
+    master = rnd if seed is None else rnd.Random(seed)
 
     def generator():
-        return RandomAgent(conf, rnd.randint(0, 10))
+        return RandomAgent(conf, master.randint(0, 10), master.getrandbits(64))
 
     return generator
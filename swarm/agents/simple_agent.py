@@ -1,5 +1,6 @@
 """ A simple agent only according number of other agents """
 from . AgentInterface import AgentInterface
+from . movement import MovementLog
 
 import random as rnd
 from typing import Callable
@@ -56,17 +57,19 @@ class SimpleAgent(AgentInterface):
 
         This agent contains a single setting.
             - continously (boolean): Use the movement of alraady moved agents
-                                     in the current turn
+                                     in the current turn (read from the live
+                                     occupancy when given a MovementLog)
     """
 
-    def __init__(self, conf, position):
+    def __init__(self, conf, position, seed=None):
         """ Create the agent
 
         :conf: The configuration of agent
         :position: The starting position of the agent
+        :seed: The seed of the private random generator
 
         """
-        AgentInterface.__init__(self, conf, position)
+        AgentInterface.__init__(self, conf, position, seed)
 
         self._tau_1 = conf.get("tau_1", 1)
         self._tau_2 = conf.get("tau_2", 1)
@@ -102,7 +105,8 @@ class SimpleAgent(AgentInterface):
         for i in lamb_2:
             likelihood[i] = sum_lamb/len(lamb_2)
 
-        logging.debug(f"Likelihood: {str(likelihood)}")
+        if logging.root.isEnabledFor(logging.DEBUG):
+            logging.debug(f"Likelihood: {str(likelihood)}")
 
         if sum(likelihood) > 1:
             logging.warn(f"The sum is approve 1({sum(likelihood)}), likelihood {likelihood}, Alpha: {nr_agents}")
@@ -127,7 +131,8 @@ class SimpleAgent(AgentInterface):
             for i in range(len(nr_agents)):
                 likelihood[i] /= s
 
-        logging.debug(f"Exploration likelihood: {likelihood}")
+        if logging.root.isEnabledFor(logging.DEBUG):
+            logging.debug(f"Exploration likelihood: {likelihood}")
 
         return likelihood
 
@@ -156,25 +161,30 @@ class SimpleAgent(AgentInterface):
         :returns: The new node it would move to
 
         """
-        self.switch_state()
         canndidates = world.connected(self.position)
         cost = []
         explorated = []
         nr_agents = []
+        continously = self._conf.get('continously', True)
         for c in canndidates:
             explorated.append(world.explorated(c))
             cost.append(world.cost(self.position, c))
-            agents = world.get_agents_numbers(c)
-            if self._conf.get('continously', True):
-                for old, new in updated_pos:
-                    if c == old:
-                        agents -= 1
-                    elif c == new:
-                        agents += 1
-
-            if agents < 0:
-                agents = 0
-            nr_agents.append(agents)
+
+        if continously and isinstance(updated_pos, MovementLog):
+            nr_agents = updated_pos.agents(canndidates)
+        else:
+            for c in canndidates:
+                agents = world.get_agents_numbers(c)
+                if continously:
+                    for old, new in updated_pos:
+                        if c == old:
+                            agents -= 1
+                        elif c == new:
+                            agents += 1
+
+                if agents < 0:
+                    agents = 0
+                nr_agents.append(agents)
 
         total = sum(nr_agents)
         a_likelihood = self.calculation(total, nr_agents)
@@ -202,24 +212,30 @@ class SimpleAgent(AgentInterface):
                          'exploration_likelihood': e_likelihood,
                          'cost_likelihood': c_likelihood})
 
-        new_position = rnd.choices(canndidates, weights=likelihood)[0]
+        if sum(likelihood) > 0:
+            new_position = self._rnd.choices(canndidates, weights=likelihood)[0]
+        else:
+            # All the candidates is equally unlikely (e.g. all the taus is
+            # zero), select one uniformly like the batched kernel
+            new_position = self._rnd.choice(canndidates)
 
         self.traveled_distance += world.cost(self.position, new_position)
         self.position = new_position
 
-        self.switch_state()
         return self._position
 
 
-def simple_agent_generator(conf=None) -> Callable:
+def simple_agent_generator(conf=None, seed=None) -> Callable:
     """ Create a simple agent generator
 
     :conf: The configuration
+    :seed: Master seed for the agents (None uses the global random module)
     :returns: A generator function
 
     """
+    master = rnd if seed is None else rnd.Random(seed)
 
     def generator():
-        return SimpleAgent(conf, rnd.randint(0, 10))
+        return SimpleAgent(conf, master.randint(0, 10), master.getrandbits(64))
 
     return generator
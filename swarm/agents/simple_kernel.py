@@ -0,0 +1,145 @@
+""" Batched likelihood kernel of the simple agent
+
+    The candidates of all agents is stored in flat arrays, where the
+    candidates of agent k is stored in [offsets[k]:offsets[k + 1]]. Every
+    agent must have at least one candidate.
+
+    The math is the same as SimpleAgent.calculation, SimpleAgent.exploration,
+    SimpleAgent.cost and the tau weighted mix in SimpleAgent.move.
+"""
+import numpy as np
+
+
+def _segments(offsets: np.ndarray) -> np.ndarray:
+    """ Get the agent index of every candidate """
+    return np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))
+
+
+def agent_likelihood(offsets: np.ndarray, alpha: np.ndarray) -> np.ndarray:
+    """ The likelihood of selecting candidates based on the number of agents at them
+
+    :offsets: The candidate offsets of the agents
+    :alpha: The number of agents at each candidate
+    :returns: The likelihood of each candidate
+
+    """
+    segment = _segments(offsets)
+    eta = np.diff(offsets).astype(np.float64)[segment]
+
+    likelihood = np.where(alpha != 0, (1 / eta) ** (alpha + 0.01), 1.0)
+
+    # Candidates with a likelihood of one shares the summed likelihood of
+    # the other candidates (one if there is none)
+    shared = likelihood == 1
+    sum_lamb = np.add.reduceat(np.where(shared, 0, likelihood), offsets[:-1])
+    sum_lamb[sum_lamb == 0] = 1
+    n_shared = np.add.reduceat(shared, offsets[:-1])
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        share = sum_lamb / n_shared
+
+    return np.where(shared, share[segment], likelihood)
+
+
+def exploration_likelihood(offsets: np.ndarray, alpha: np.ndarray,
+                           explorated: np.ndarray) -> np.ndarray:
+    """ The likelihood of selecting candidates based on if they are explorated
+
+    :offsets: The candidate offsets of the agents
+    :alpha: The number of agents at each candidate
+    :explorated: If each candidate is explorated
+    :returns: The likelihood of each candidate
+
+    """
+    likelihood = (~explorated | (alpha > 0)).astype(np.float64)
+    total = np.add.reduceat(likelihood, offsets[:-1])
+    total[total == 0] = 1
+
+    return likelihood / total[_segments(offsets)]
+
+
+def cost_likelihood(offsets: np.ndarray, cost: np.ndarray) -> np.ndarray:
+    """ The likelihood of not selecting candidates based on the travel cost
+
+    :offsets: The candidate offsets of the agents
+    :cost: The travel cost to each candidate
+    :returns: The likelihood of each candidate
+
+    """
+    return _min_max(offsets, np.asarray(cost, dtype=np.float64))
+
+
+def likelihood(offsets: np.ndarray, alpha: np.ndarray, explorated: np.ndarray,
+               cost: np.ndarray, tau_1, tau_2, tau_3) -> np.ndarray:
+    """ The complete likelihood of selecting the candidates
+
+    :offsets: The candidate offsets of the agents
+    :alpha: The number of agents at each candidate
+    :explorated: If each candidate is explorated
+    :cost: The travel cost to each candidate
+    :tau_1: The weight of the agent likelihood (scalar or per agent)
+    :tau_2: The weight of the exploration likelihood (scalar or per agent)
+    :tau_3: The weight of the cost likelihood (scalar or per agent)
+    :returns: The min-max normalized likelihood of each candidate
+
+    """
+    segment = _segments(offsets)
+    tau_1 = np.broadcast_to(tau_1, len(offsets) - 1)[segment]
+    tau_2 = np.broadcast_to(tau_2, len(offsets) - 1)[segment]
+    tau_3 = np.broadcast_to(tau_3, len(offsets) - 1)[segment]
+
+    mix = (tau_1 * agent_likelihood(offsets, alpha)
+           + tau_2 * exploration_likelihood(offsets, alpha, explorated)
+           - tau_3 * cost_likelihood(offsets, cost))
+
+    return _min_max(offsets, mix, keep=True)
+
+
+def weighted_choice(offsets: np.ndarray, weights: np.ndarray,
+                    rng: np.random.Generator) -> np.ndarray:
+    """ Select a candidate for each agent proportional to the weights
+
+        Agents where the weights does not sum to a positive number selects
+        uniformly between their candidates.
+
+    :offsets: The candidate offsets of the agents
+    :weights: The weight of each candidate
+    :rng: The random generator
+    :returns: The index (into the flat candidate arrays) of the selected candidates
+
+    """
+    start = offsets[:-1]
+    size = np.diff(offsets)
+
+    cum_weights = np.cumsum(weights, dtype=np.float64)
+    base = np.concatenate(([0.0], cum_weights))[start]
+    total = cum_weights[offsets[1:] - 1] - base
+
+    target = base + rng.random(len(size)) * total
+    selected = np.searchsorted(cum_weights, target, side="right")
+    selected = np.clip(selected, start, offsets[1:] - 1)
+
+    uniform = ~(total > 0)
+    if np.any(uniform):
+        selected[uniform] = start[uniform] + (rng.random(np.count_nonzero(uniform)) * size[uniform]).astype(np.int64)
+
+    return selected
+
+
+def _min_max(offsets: np.ndarray, values: np.ndarray, keep=False) -> np.ndarray:
+    """ Min-max normalize the values of each agent
+
+    :offsets: The candidate offsets of the agents
+    :values: The values
+    :keep: Keep the values of agents where all values are equal (else zero)
+    :returns: The normalized values
+
+    """
+    segment = _segments(offsets)
+    _min = np.minimum.reduceat(values, offsets[:-1])[segment]
+    diff = np.maximum.reduceat(values, offsets[:-1])[segment] - _min
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        normalized = (values - _min) / diff
+
+    return np.where(diff != 0, normalized, values if keep else 0.0)
@@ -0,0 +1,148 @@
+""" Benchmark of the simulation loop
+
+    Measures the import time of the package and the turns per second of the
+    simulation loop (without display) for random and simple agents. Given a
+    checkout of an earlier version of the package (e.g. from git worktree),
+    the same measurements is run against it in a subprocess and compared.
+
+    Run with: python -m swarm.benchmark --help
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+
+
+def import_time(path: str) -> float:
+    """ Measure the time of importing the package in a new interpreter
+
+    :path: The directory containing the package
+    :returns: The time in seconds
+
+    """
+    code = "import time; t = time.perf_counter(); import swarm; print(time.perf_counter() - t)"
+    output = subprocess.run([sys.executable, "-c", code], cwd=path, check=True,
+                            capture_output=True, text=True,
+                            env=dict(os.environ, PYTHONPATH=path)).stdout
+
+    return float(output.split()[-1])
+
+
+def turns_per_second(world, generators, turns: int) -> float:
+    """ Measure the turns per second of a single simulation
+
+    :world: The world
+    :generators: The agent generators
+    :turns: The number of turns to simulate
+    :returns: The turns per second
+
+    """
+    from swarm import Swarm, Simulator
+
+    world.reset()
+    swarm = Swarm(generators)
+    swarm.set_positions(0)
+
+    sim = Simulator(world, display=False, max_turns=turns)
+
+    start = time.perf_counter()
+    result = sim.start(swarm)
+    elapsed = time.perf_counter() - start
+
+    return result.turns / elapsed
+
+
+def measure(args) -> dict:
+    """ Run the measurements with the imported package
+
+    :args: The arguments
+    :returns: The import time and the turns per second of each agent type
+
+    """
+    from swarm.world import WorldGenerator
+    from swarm.agents import random_agent_generator, simple_agent_generator
+
+    def seeded(factory, *conf, seed):
+        try:
+            return factory(*conf, seed=seed)
+        except TypeError:
+            # Older versions has no agent seeds
+            return factory(*conf)
+
+    logging.root.setLevel(logging.ERROR)
+    world = WorldGenerator((args.nodes, args.nodes + 1), 1.5, (1, 10), 0).generate()
+
+    agents = {
+        "random": lambda seed: [[args.swarm, seeded(random_agent_generator, seed=seed)]],
+        "simple": lambda seed: [[args.swarm, seeded(simple_agent_generator, {}, seed=seed)]],
+    }
+
+    import swarm
+    results = {"import": import_time(os.path.dirname(os.path.dirname(os.path.abspath(swarm.__file__))))}
+    for name, generators in agents.items():
+        results[name] = max(turns_per_second(world, generators(seed), args.turns)
+                            for seed in range(args.repeat))
+
+    return results
+
+
+def measure_baseline(args) -> dict:
+    """ Run the measurements against the baseline package in a subprocess
+
+    :args: The arguments
+    :returns: The import time and the turns per second of each agent type
+
+    """
+    path = os.path.abspath(args.baseline)
+    argv = [__file__, "-n", str(args.nodes), "-s", str(args.swarm),
+            "-t", str(args.turns), "-r", str(args.repeat), "--json"]
+    # The file is run by path, so the baseline package is imported
+    code = f"import runpy, sys; sys.argv = {argv!r}; runpy.run_path(sys.argv[0], run_name='__main__')"
+    output = subprocess.run([sys.executable, "-c", code], cwd=path, check=True,
+                            capture_output=True, text=True,
+                            env=dict(os.environ, PYTHONPATH=path)).stdout
+
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    """ Run the benchmark """
+    parser = argparse.ArgumentParser(description="Benchmark the simulation loop")
+    parser.add_argument("-n", "--nodes", type=int, default=2000,
+                        help="The number of nodes in the world")
+    parser.add_argument("-s", "--swarm", type=int, default=20,
+                        help="The size of the swarm")
+    parser.add_argument("-t", "--turns", type=int, default=200,
+                        help="The number of turns for each simulation")
+    parser.add_argument("-r", "--repeat", type=int, default=5,
+                        help="The number of simulations for each agent type")
+    parser.add_argument("-b", "--baseline", metavar="directory",
+                        help="A directory with an earlier version of the package to compare with")
+    parser.add_argument("--json", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    results = measure(args)
+    if args.json:
+        print(json.dumps(results))
+        return
+
+    print(f"World: {args.nodes} nodes, swarm: {args.swarm} agents, {args.turns} turns")
+    baseline = measure_baseline(args) if args.baseline is not None else None
+
+    print(f"{'import':>8}: {results['import']:10.2f} s", end="")
+    if baseline is not None:
+        print(f", baseline {baseline['import']:10.2f} s ({baseline['import'] / results['import']:.2f}x)", end="")
+    print()
+
+    for name in ("random", "simple"):
+        print(f"{name:>8}: {results[name]:10.1f} turns/s", end="")
+        if baseline is not None:
+            print(f", baseline {baseline[name]:10.1f} turns/s ({results[name] / baseline[name]:.2f}x)", end="")
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,9 @@
 """ This module is used for debuggering the agents """
 from .world import World, NoColor, ClassicColor
+from .trajectory import Trajectory
+from .replay import ReplayIndex
 from cmd import Cmd
-
-import matplotlib.pyplot as plt
+import numpy as np
 
 
 class Debugger(Cmd):
@@ -12,26 +13,53 @@ class Debugger(Cmd):
     prompt = ">> "
     intro = "Welcome! Type ? to list commands"
 
-    def __init__(self, world: World, results):
+    def __init__(self, world: World, trajectory: Trajectory, replay: ReplayIndex = None):
         """ Create the debugger
 
             :world: The world used
-            :results: The results from a data recorder
+            :trajectory: The trajectory from a data recorder (see swarm.trajectory.load_results)
+            :replay: The index of the trajectory (None to build it, see ReplayIndex.cached)
         """
         Cmd.__init__(self)
         self._world = world
-        self._results = results
+        self._trajectory = trajectory
+        self._results = trajectory.summary
+        self._positions = trajectory.positions
+
+        if replay is None:
+            replay = ReplayIndex.build(trajectory, world.size())
+        self._replay = replay
 
-        self._get_discovered()
+        # The shown turn and its discovered nodes, the next turn is shown by
+        # updating them
+        self._shown = None
+        self._explorated = None
+        self._color_map = ClassicColor()
 
-    def show_map(self, node_id, colormap):
+    def show_map(self, node_id, colormap, title=None):
         """ Show the map """
-        self._world.view(False, node_id=node_id, color_map=colormap)
-        plt.show(False)
+        import matplotlib.pyplot as plt
+        self._world.view(False, node_id=node_id, color_map=colormap, title=title)
+        plt.show(block=False)
+
+    def show_turn(self, turn: int):
+        """ Show the map at a turn
+
+            The discovered nodes is rebuilt from the shown turn or a keyframe
+            (see ReplayIndex.explorated_mask).
+
+        :turn: The turn
+
+        """
+        self._explorated = self._replay.explorated_mask(turn, self._explorated, self._shown)
+        self._shown = turn
+
+        self._world.set_explorated(self._explorated)
+        self.show_map(True, self._color_map, f"Turn: {turn}")
 
     def _check_turn(self, turn: int) -> bool:
         """ Check if turn is available """
-        if 0 <= turn <= int(self._results['turns']):
+        if 0 <= turn < self._replay.turns:
             return True
 
         print(f"There was no turn {turn}")
@@ -40,45 +68,13 @@ class Debugger(Cmd):
 
     def _check_node(self, node: int) -> bool:
         """ Check if turn is available """
-        if 0 <= node <= int(self._results['nodes']):
+        if 0 <= node < self._world.size():
             return True
 
         print(f"There was no node {node}")
 
         return False
 
-    def _get_discovered(self):
-        turns = int(self._results["turns"])
-        agents = len(self._results['agents_history'])
-
-        self._discovered = []
-        
-        #self._visists = [[False] * turns] * int(self._results['nodes'])
-
-        self._visists = []
-        for i in range(int(self._results['nodes'])):
-            v = []
-            for j in range(turns):
-                v.append(False)
-            self._visists.append(v)
-
-        for i in range(turns):
-            vis = []
-            if len(self._discovered) != 0:
-                dis = [s for s in self._discovered[-1]]
-            else:
-                dis = []
-
-            for j in range(agents):
-                dis.append(self._results['agents_history'][j][i])
-                vis.append(self._results['agents_history'][j][i])
-
-            for s in set(vis):
-                self._visists[s][i] = True
-
-            unique = [s for s in set(dis)]
-            self._discovered.append(unique)
-
     def do_exit(self, inp):
         """ Exit prompt """
         return True
@@ -97,15 +93,33 @@ class Debugger(Cmd):
             else:
                 turn = int(args[0])
                 if self._check_turn(turn):
-                    self._world.reset()
-                    for n in self._discovered[turn]:
-                        self._world.explore(n)
-
-                    self.show_map(True, ClassicColor())
+                    self.show_turn(turn)
 
     def help_show(self):
         print("Show the map\n\t usage: show [turn]\n\n If given a turn it would show the state of the turn")
 
+    def do_next(self, inp):
+        """ Show a later turn """
+        turn = -1 if self._shown is None else self._shown
+        turn += int(inp) if len(inp) != 0 else 1
+
+        if self._check_turn(turn):
+            self.show_turn(turn)
+
+    def help_next(self):
+        print("Show the next turn\n\t usage: next [turns]\n\n If given a number of turns it would skip forward that many turns")
+
+    def do_back(self, inp):
+        """ Show an earlier turn """
+        turn = 0 if self._shown is None else self._shown
+        turn -= int(inp) if len(inp) != 0 else 1
+
+        if self._check_turn(turn):
+            self.show_turn(turn)
+
+    def help_back(self):
+        print("Show the previous turn\n\t usage: back [turns]\n\n If given a number of turns it would skip back that many turns")
+
     def do_node(self, inp):
         """ Show information about a node """
         args = inp.split(" ")
@@ -115,16 +129,11 @@ class Debugger(Cmd):
 
             if self._check_node(node):
                 print(f"Node {node}")
-                for i, n in enumerate(self._discovered):
-                    if node in n:
-                        print(f"\tDiscovered in: {i}")
-                        break
-                s = ""
-                for i, b in enumerate(self._visists[node]):
-                    if b:
-                        s += str(i)
-                        s += " "
+                first = self._replay.first(node)
+                if first >= 0:
+                    print(f"\tDiscovered in: {first}")
 
+                s = " ".join(str(t) for t in self._replay.visits(node).tolist())
                 print(f"\tVisists {s}")
 
     def help_node(self):
@@ -132,7 +141,6 @@ class Debugger(Cmd):
 
     def do_turn(self, inp):
         """ Show information about a given turn """
-        agents = len(self._results['agents_history'])
         args = inp.split(" ")
 
         for turn in args:
@@ -140,12 +148,8 @@ class Debugger(Cmd):
 
             if self._check_turn(turn):
                 print(f"Turn {turn}")
-                turns_agents = []
-                for i in range(agents):
-                    turns_agents.append(self._results['agents_history'][i][turn])
-
-                for n in set(turns_agents):
-                    print(f"\tNode {n} has {turns_agents.count(n)} agents")
+                for n, count in zip(*self._replay.occupancy(turn)):
+                    print(f"\tNode {n} has {count} agents")
 
     def help_turn(self):
         print("Show information about a turn\n\tusgae: turn turn_nr ...")
@@ -161,21 +165,22 @@ class Debugger(Cmd):
         else:
             turn = int(args[0])
             node = int(args[1])
+            if not (self._check_turn(turn) and self._check_node(node)):
+                return
 
             print(f"Information about {node} at turn {turn}")
 
-            if node in self._discovered[turn]:
+            if self._replay.explorated(turn, node):
                 print("\t- Explorated")
             else:
                 print("\t- Unexplorated")
-            
+
             agents = []
-            for i, agent in enumerate(self._results["agents_history"]):
-                if int(agent[turn]) == node:
-                    next = "Finished"
-                    if turn < len(agent)-1:
-                        next = f"Node {agent[turn + 1]}"
-                    agents.append((i, next))
+            for i in np.flatnonzero(self._positions[turn] == node).tolist():
+                next = "Finished"
+                if turn < len(self._positions) - 1:
+                    next = f"Node {self._positions[turn + 1, i]}"
+                agents.append((i, next))
 
             if len(agents) == 0:
                 print("\t- No agents at node")
@@ -184,7 +189,7 @@ class Debugger(Cmd):
 
                 for agent, next in agents:
                     print(f"\t\t- Agent {agent} -> Move to {next}")
-                    info = self._results["agents_record"][agent][turn]
+                    info = self._trajectory.record(turn, agent)
 
                     for key in info:
                         value = info[key]
@@ -30,6 +30,8 @@ def world_generation():
 #def get_video_recorder():
 #    \"\"\" Get the recorder of the simulations \"\"\"
 #    return swarm.VideoRecorder(1), "filename.mp4"
+#    # Or render the frames after the simulation, in a process pool
+#    return swarm.OfflineVideoRecorder(1), "filename.mp4"
 
 ##################################
 # THIS FUNCTION IS NOT REQUIRED  #
@@ -38,6 +40,8 @@ def world_generation():
 #def get_data_recorder():
 #    \"\"\" Save the data from the simuation to file \"\"\"
 #    return swarm.BasicDataRecorder(\"results.yaml\")
+#    # Or write the positions and records of the agents during the simulation
+#    return swarm.StreamDataRecorder(\"results.yaml\")
 
 
 ##################################
@@ -65,3 +69,33 @@ def get_sim_args():
              'speed': 1,
             }
 """
+
+
+def get_sweep_example():
+    """ Get the example grid of a sweep """
+    return """\
+# The worlds, every combination of the values is generated once
+world:
+  nodes: [[20, 50]]
+  edge_multiplier: [1]
+  edge_cost: [[1, 10]]
+  seed: [0]
+
+# The agents, every combination of the values is run in every world
+agents:
+  simple:
+    count: [2, 5, 10, 15, 20]
+    tau_1: [0, 0.2, 0.4, 0.6, 0.8, 1.0]
+    tau_2: [0, 0.2, 0.4, 0.6, 0.8, 1.0]
+    tau_3: [0, 0.1, 0.2, 0.3, 0.4, 0.5]
+  random:
+    count: [2, 5, 10, 15, 20]
+
+# The number of replicates of every configuration, the agent seeds is
+# first_seed, ..., first_seed + replicates - 1
+replicates: 30
+first_seed: 0
+
+max_turns: 100
+vectorized: false
+"""
@@ -1,7 +1,11 @@
 """ Recording the simulation """
+from collections import deque
 from tempfile import TemporaryDirectory
 import logging
 import os
+import shutil
+import subprocess
+import numpy as np
 
 
 
@@ -18,25 +22,52 @@ class DummyRecorder(object):
 
 class VideoRecorder(object):
 
-    """ Video recording the simulation """
+    """ Video recording the simulation
 
-    def __init__(self, fps):
+        ffmpeg is started at the first frame and the RGBA buffer of each
+        frame is written to its stdin as raw video, so no frames is written
+        to disk.
+    """
+
+    def __init__(self, fps, filename=None):
         """ Create the Video Recorder
 
             :fps: frames pr second
+            :filename: The filename of the video, if it is known before the
+                       recording (else it is encoded to a temporary file,
+                       which is moved on save)
         """
-        self._temp_dir = TemporaryDirectory()
-        self._temp = self._temp_dir.name
-        logging.debug(f"Recording temperary directory: {self._temp}")
-        self._frame_id = 0
         self._fps = fps
+        self._filename = filename
+        self._temp_dir = None
+        self._output = None
+        self._process = None
+        self._shape = None
+        self._frame_id = 0
 
     def record(self, fig) -> None:
         """ Perform a recording of a matplotlib figure
 
         """
         logging.debug(f"Recording frame {self._frame_id}")
-        fig.savefig(f"{self._temp}/frame_{self._frame_id}")
+        # A figure updated by blitting (see World.view) is not stale, and the
+        # canvas already holds the frame
+        if fig.stale:
+            fig.canvas.draw()
+        self._write(np.asarray(fig.canvas.buffer_rgba()))
+
+    def _write(self, frame: np.ndarray) -> None:
+        """ Write a RGBA frame to ffmpeg
+
+        :frame: The frame
+
+        """
+        if self._process is None:
+            self._open(frame.shape)
+        elif frame.shape != self._shape:
+            frame = _fit(frame, self._shape)
+
+        self._process.stdin.write(np.ascontiguousarray(frame).data)
         self._frame_id += 1
 
     def save(self, filename):
@@ -45,7 +76,214 @@ class VideoRecorder(object):
         :filename: The filename of the video
 
         """
-        os.system(f"ffmpeg -r {self._fps} -i {self._temp}/frame_%01d.png -vcodec mpeg4 -y {filename}")
+        if self._process is None:
+            logging.warning("No frames has been recorded, the video is not saved")
+            return
+
+        self._process.stdin.close()
+        if self._process.wait() != 0:
+            logging.error(f"ffmpeg failed to encode the video {filename}")
+            return
+
+        if os.path.abspath(self._output) != os.path.abspath(filename):
+            if os.path.splitext(self._output)[1] == os.path.splitext(filename)[1]:
+                shutil.move(self._output, filename)
+            else:
+                # Only the container is changed, the video is not reencoded
+                subprocess.run(["ffmpeg", "-y", "-loglevel", "error",
+                                "-i", self._output, "-c", "copy", filename])
+
+        self._process = None
+
+    def _open(self, shape) -> None:
+        """ Start ffmpeg for frames of the shape
+
+        :shape: The shape of the RGBA buffer (height, width, 4)
+
+        """
+        self._shape = shape
+        self._output = self._filename
+        if self._output is None:
+            self._temp_dir = TemporaryDirectory()
+            self._output = os.path.join(self._temp_dir.name, "video.mp4")
+        logging.debug(f"Recording to {self._output}")
+
+        height, width = shape[:2]
+        command = ["ffmpeg", "-y", "-loglevel", "error",
+                   "-f", "rawvideo", "-pix_fmt", "rgba",
+                   "-s", f"{width}x{height}", "-r", str(self._fps),
+                   "-i", "-",
+                   # The encoder requires even dimensions
+                   "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+                   "-vcodec", "mpeg4", self._output]
+        self._process = subprocess.Popen(command, stdin=subprocess.PIPE)
+
+
+class OfflineVideoRecorder(VideoRecorder):
+
+    """ Video recording the simulation after it has finished
+
+        During the simulation only the state and the number of agents of
+        each node is logged every turn (3 bytes per node). The frames is
+        rendered on save in a process pool, and written to ffmpeg in order,
+        so the speed of the simulation does not depend on the rendering.
+    """
+
+    def __init__(self, fps, filename=None, workers=None, figsize=None, dpi=None):
+        """ Create the recorder
+
+        :fps: frames pr second
+        :filename: The filename of the video, if it is known before the recording
+        :workers: The number of rendering processes (None for the number of CPUs)
+        :figsize: The size of the frames in inches (None for the matplotlib default)
+        :dpi: The resolution of the frames (None for the matplotlib default)
+
+        """
+        VideoRecorder.__init__(self, fps, filename)
+        self._workers = workers
+        self._figsize = figsize
+        self._dpi = dpi
+        self._world = None
+        self._states = []
+        self._agents = []
+        self._titles = []
+
+    def record(self, fig) -> None:
+        """ The figure is not recorded, the frames is rendered from the log """
+        pass
+
+    def log(self, world, turn: int, explorated: int) -> None:
+        """ Log the state of the world in a turn
+
+        :world: The world
+        :turn: The turn
+        :explorated: The number of explorated nodes
+
+        """
+        self._world = world
+        self._states.append(world.node_states())
+        self._agents.append(np.minimum(world.occupancy(), np.iinfo(np.uint16).max).astype(np.uint16))
+        self._titles.append((turn, explorated))
+
+    @property
+    def states(self) -> np.ndarray:
+        """ The state of every node in each logged turn (turns x nodes) """
+        return np.array(self._states, dtype=np.uint8)
+
+    @property
+    def agents(self) -> np.ndarray:
+        """ The number of agents at every node in each logged turn (turns x nodes) """
+        return np.array(self._agents, dtype=np.uint16)
+
+    def save(self, filename):
+        """ Render the frames and save the video
+
+        :filename: The filename of the video
+
+        """
+        if self._world is not None:
+            self._render()
+
+        VideoRecorder.save(self, filename)
+
+    def _render(self) -> None:
+        """ Render the logged turns in a process pool and write them in order """
+        from concurrent.futures import ProcessPoolExecutor
+
+        workers = self._workers or os.cpu_count()
+        settings = (self._world.drawing(), self._figsize, self._dpi)
+        size = max(1, min(16, len(self._states) // (4 * workers)))
+        chunks = [range(i, min(i + size, len(self._states)))
+                  for i in range(0, len(self._states), size)]
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_initialize_renderer,
+                                 initargs=settings) as executor:
+            # Only a few chunks is rendered ahead, to bound the memory use
+            pending = deque()
+            for chunk in chunks:
+                pending.append(executor.submit(_render_frames,
+                                               [self._states[i] for i in chunk],
+                                               [self._agents[i] for i in chunk],
+                                               [self._titles[i] for i in chunk]))
+                if len(pending) > 2 * workers:
+                    self._write_frames(pending.popleft().result())
+
+            while pending:
+                self._write_frames(pending.popleft().result())
+
+        self._world = None
+        self._states.clear()
+        self._agents.clear()
+        self._titles.clear()
+
+    def _write_frames(self, frames) -> None:
+        """ Write rendered frames to ffmpeg
+
+        :frames: The shape and bytes of each frame
+
+        """
+        for shape, data in frames:
+            self._write(np.frombuffer(data, dtype=np.uint8).reshape(shape))
+
+
+# The figure and drawing of the world in the current rendering process
+_renderer = {}
+
+
+def _initialize_renderer(drawing, figsize, dpi) -> None:
+    """ Create the figure and draw the static part of the world in a rendering process
+
+    :drawing: The graph, node positions, edge labels and map type (see World.drawing)
+    :figsize: The size of the frames in inches
+    :dpi: The resolution of the frames
+
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from .world.view import WorldView
+    from .world import ClassicColor
+
+    fig = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(fig)
+    _renderer["fig"] = fig
+    _renderer["view"] = WorldView(fig, *drawing)
+    _renderer["color_map"] = ClassicColor()
+
+
+def _render_frames(states, agents, titles) -> list:
+    """ Render frames in a rendering process
+
+    :states: The state of the nodes in each frame
+    :agents: The number of agents at the nodes in each frame
+    :titles: The turn and the number of explorated nodes in each frame
+    :returns: The shape and bytes of each frame
+
+    """
+    fig, view = _renderer["fig"], _renderer["view"]
+    frames = []
+    for state, agent, (turn, explorated) in zip(states, agents, titles):
+        view.update(state, agent, _renderer["color_map"],
+                    f"Turn: {turn}, Visisted nodes: {explorated}")
+        frame = np.asarray(fig.canvas.buffer_rgba())
+        frames.append((frame.shape, frame.tobytes()))
+
+    return frames
+
+
+def _fit(frame, shape):
+    """ Crop or pad a frame with white to the shape
+
+    :frame: The frame
+    :shape: The shape
+    :returns: The frame with the shape
+
+    """
+    fitted = np.full(shape, 255, dtype=frame.dtype)
+    height = min(shape[0], frame.shape[0])
+    width = min(shape[1], frame.shape[1])
+    fitted[:height, :width] = frame[:height, :width]
+
+    return fitted
 
 
 class DummyDataRecorder(object):
@@ -59,6 +297,20 @@ class DummyDataRecorder(object):
         self._filename = filename
         self._data_functions = []
 
+    def start(self, sim, swarm):
+        """ Called by the simulator before the first turn
+            :sim: The simulation
+            :swarm: The swarm
+        """
+        pass
+
+    def turn(self, sim, swarm):
+        """ Called by the simulator after every turn
+            :sim: The simulation
+            :swarm: The swarm
+        """
+        pass
+
     def save(self, sim, swarm):
         """ Save the results of simulation to file
             :sim: The simulation
@@ -121,27 +373,130 @@ class AgentDataRecorder(BasicDataRecorder):
         logging.warn("AgentDataRecorder requires that agents has enable there history for workning")
 
     def agent_history(self, sim, swarm, f):
-        """ Save the movement history of the agent
+        """ Save the movement history and records of the agents
+
+            They are saved to a binary trajectory file beside the file (see
+            swarm.trajectory), which the file refers to.
+
+        :sim: The simulation
+        :swarm: The swarm
+        :f: The file
+
+        """
+        from .trajectory import Trajectory
+
+        sim_results = sim.get_results()
+        summary = {"seed": sim_results.seed, "nodes": sim_results.nodes,
+                   "turns": sim_results.turns, "discovered": sim_results.discovered}
+
+        filename = os.path.splitext(self._filename)[0] + ".npz"
+        Trajectory.from_agents(swarm._agents, summary).save(filename)
+
+        f.write(f"trajectory: {os.path.basename(filename)}\n")
+
+
+class StreamDataRecorder(BasicDataRecorder):
+
+    """ Recorder information about the agents, written during the simulation
+
+        The simulator hands the positions and the new records of the agents
+        to the recorder every turn, which appends them to the trajectory file
+        in chunks (see swarm.trajectory.TrajectoryWriter). The records is
+        taken from the agents, so the memory does not grow with the turns,
+        and the agents does not need to enable their history. The file is
+        the same as the one of the AgentDataRecorder.
+    """
+
+    def __init__(self, filename="result.yaml", chunk=256):
+        """ Create the recorder
+
+        :filename: The file to save to
+        :chunk: The number of turns kept in memory between the writes
+
+        """
+        BasicDataRecorder.__init__(self, filename)
+        self._data_functions.append(self.trajectory)
+        self._chunk = chunk
+        self._writer = None
+        self._positions = None
+
+    def start(self, sim, swarm):
+        """ Open the trajectory file
+
+        :sim: The simulation
+        :swarm: The swarm
+
+        """
+        from .trajectory import TrajectoryWriter
+
+        self._positions = swarm.positions.copy()
+        self._writer = TrajectoryWriter(self._trajectory_filename(),
+                                        len(self._positions), self._chunk)
+        # Forget the records made before the simulation
+        swarm.pop_records()
+
+    def turn(self, sim, swarm):
+        """ Append the turn to the trajectory file
+
+            Like the history of the agents, the positions of a turn is where
+            the agents was when they made the records of the turn.
+
+        :sim: The simulation
+        :swarm: The swarm
+
+        """
+        self._writer.append(self._positions, swarm.pop_records())
+        self._positions = swarm.positions.copy()
+
+    def trajectory(self, sim, swarm, f):
+        """ Finish the trajectory file and refer to it
 
         :sim: The simulation
         :swarm: The swarm
         :f: The file
 
         """
-        f.write("agents_history: [\n")
+        sim_results = sim.get_results()
+        summary = {"seed": sim_results.seed, "nodes": sim_results.nodes,
+                   "turns": sim_results.turns, "discovered": sim_results.discovered}
 
-        for agent in swarm._agents:
-            f.write(f"{agent._history},\n")
+        self._writer.append(self._positions, swarm.pop_records())
+        self._writer.close(summary)
+        self._writer = None
 
-        f.write("]\n")
+        f.write(f"trajectory: {os.path.basename(self._trajectory_filename())}\n")
 
-        f.write("agents_record: [\n")
+    def _trajectory_filename(self) -> str:
+        """ The trajectory file beside the file """
+        return os.path.splitext(self._filename)[0] + ".npz"
 
-        for agent in swarm._agents:
-            f.write(f"{agent._record},\n")
 
-        f.write("]\n")
+class StoreDataRecorder(DummyDataRecorder):
+
+    """ Adding the result of the simulation to a ResultStore """
+
+    def __init__(self, filename="results.db", **metadata):
+        """ Create the recorder
+
+        :filename: The database file
+        :metadata: The other columns of the run, e.g. the taus (see swarm.store.COLUMNS)
+
+        """
+        DummyDataRecorder.__init__(self, filename)
+        self._metadata = metadata
+
+    def save(self, sim, swarm):
+        """ Add the run to the store
+
+        :sim: The simulation
+        :swarm: The swarm
+
+        """
+        from .store import ResultStore
 
+        with ResultStore(self._filename) as store:
+            store.add(ResultStore.run(sim.get_results(), swarm.summary(),
+                                      **self._metadata))
 
 
-DATA_RECORDER_LIST = [DummyDataRecorder.__name__, BasicDataRecorder.__name__, AgentDataRecorder.__name__]
+DATA_RECORDER_LIST = [DummyDataRecorder.__name__, BasicDataRecorder.__name__, AgentDataRecorder.__name__, StreamDataRecorder.__name__, StoreDataRecorder.__name__]
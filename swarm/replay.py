@@ -0,0 +1,278 @@
+""" An index of a trajectory for replaying it in the debugger
+
+    The visits of the agents is indexed once, after which the questions of
+    the debugger is answered without scanning the trajectory:
+        - The first turn each node was visited (discovered).
+        - The sorted turns each node was visited, for all nodes in a single
+          array with an offset per node.
+        - The occupied nodes and their number of agents in each turn, with an
+          offset per turn.
+
+    The discovered nodes of a turn is rebuilt from a keyframe, a bitset of
+    the discovered nodes every KEYFRAME turns, and the nodes discovered in
+    the turns after the keyframe (the deltas).
+
+    The index is cached in an uncompressed npz file beside the result file,
+    the keyframes is made when it is loaded.
+"""
+from typing import Tuple
+import logging
+import os
+import numpy as np
+
+from .trajectory import Trajectory
+
+
+# The version of the cache, a cache of another version is rebuilt
+VERSION = 1
+
+# The first discovery turn of a node which was never visited
+NEVER = -1
+
+# The number of turns between the keyframes
+KEYFRAME = 256
+
+
+class ReplayIndex(object):
+
+    """ The visits of every node and the occupancy of every turn """
+
+    def __init__(self, shape: Tuple[int, int], first: np.ndarray, visit_offsets: np.ndarray,
+                 visits: np.ndarray, occupancy_offsets: np.ndarray,
+                 occupancy_nodes: np.ndarray, occupancy_counts: np.ndarray,
+                 keyframe: int = KEYFRAME):
+        """ Create the index, see build
+
+        :shape: The turns and agents of the indexed trajectory
+        :first: The first turn each node was visited (NEVER if not visited)
+        :visit_offsets: The start of the visits of each node (nodes + 1)
+        :visits: The turns each node was visited
+        :occupancy_offsets: The start of the occupied nodes of each turn (turns + 1)
+        :occupancy_nodes: The occupied nodes, sorted in each turn
+        :occupancy_counts: The number of agents at the occupied nodes
+        :keyframe: The number of turns between the keyframes
+
+        """
+        self._shape = tuple(shape)
+        self._first = first
+        self._visit_offsets = visit_offsets
+        self._visits = visits
+        self._occupancy_offsets = occupancy_offsets
+        self._occupancy_nodes = occupancy_nodes
+        self._occupancy_counts = occupancy_counts
+
+        # The discovered nodes ordered by turn, with an offset per turn
+        discovered = np.flatnonzero(first != NEVER)
+        self._discoveries = discovered[np.argsort(first[discovered], kind="stable")]
+        self._discovery_offsets = _offsets(first[self._discoveries], self.turns)
+
+        self._keyframe = keyframe
+        keyframes = (self.turns - 1) // keyframe + 1 if self.turns > 0 else 0
+        self._keyframes = np.zeros((keyframes, (self.nodes + 7) // 8), dtype=np.uint8)
+        mask = np.zeros(self.nodes, dtype=bool)
+        previous = -1
+        for k in range(len(self._keyframes)):
+            mask[self._delta(previous, k * keyframe)] = True
+            self._keyframes[k] = np.packbits(mask)
+            previous = k * keyframe
+
+    @classmethod
+    def build(cls, trajectory: Trajectory, nodes: int = 0):
+        """ Index a trajectory
+
+        :trajectory: The trajectory
+        :nodes: The number of nodes in the world (at least the visited nodes is indexed)
+        :returns: The index
+
+        """
+        positions = trajectory.positions
+        turns, agents = positions.shape
+        valid = positions.reshape(-1) >= 0
+
+        visited = positions.reshape(-1)[valid].astype(np.int64)
+        turn = np.repeat(np.arange(turns, dtype=np.int64), agents)[valid]
+        size = max(int(nodes), int(visited.max()) + 1 if len(visited) else 0)
+        width = max(size, 1)
+
+        # The occupied nodes of each turn, sorted by turn and then by node
+        keys, counts = np.unique(turn * width + visited, return_counts=True)
+        occupancy_turns = keys // width
+        occupancy_nodes = (keys % width).astype(np.int32)
+        occupancy_offsets = _offsets(occupancy_turns, turns)
+
+        # A stable sort by node keeps the turns of each node sorted
+        order = np.argsort(occupancy_nodes, kind="stable")
+        visits = occupancy_turns[order].astype(np.int32)
+        visit_offsets = _offsets(occupancy_nodes, size)
+
+        first = np.full(size, NEVER, dtype=np.int32)
+        has_visits = np.diff(visit_offsets) > 0
+        first[has_visits] = visits[visit_offsets[:-1][has_visits]]
+
+        return cls(positions.shape, first, visit_offsets, visits, occupancy_offsets,
+                   occupancy_nodes, counts.astype(np.int32))
+
+    @classmethod
+    def cached(cls, filename: str, trajectory: Trajectory, nodes: int = 0):
+        """ Get the index of a result file, from the cache beside it if it is up to date
+
+            The index is built and cached if the cache is missing, older than
+            the result file or from another version.
+
+        :filename: The result file the trajectory was loaded from
+        :trajectory: The trajectory
+        :nodes: The number of nodes in the world
+        :returns: The index
+
+        """
+        cache = os.path.splitext(filename)[0] + ".replay.npz"
+        if os.path.exists(cache) and os.path.getmtime(cache) >= os.path.getmtime(filename):
+            with np.load(cache) as data:
+                index = cls.load(data) if data["version"] == VERSION else None
+
+            if index is not None and index.shape == trajectory.positions.shape \
+                    and index.nodes >= nodes:
+                return index
+
+        index = cls.build(trajectory, nodes)
+        try:
+            index.save(cache)
+        except OSError as e:
+            logging.warning(f"Could not cache the replay index: {e}")
+
+        return index
+
+    @classmethod
+    def load(cls, data):
+        """ Load an index
+
+        :data: The loaded cache file
+        :returns: The index
+
+        """
+        return cls(data["shape"].tolist(), data["first"], data["visit_offsets"],
+                   data["visits"], data["occupancy_offsets"],
+                   data["occupancy_nodes"], data["occupancy_counts"])
+
+    def save(self, filename: str) -> None:
+        """ Save the index
+
+        :filename: The cache file (.npz)
+
+        """
+        with open(filename, "wb") as f:
+            np.savez(f, version=VERSION, shape=np.asarray(self._shape),
+                     first=self._first, visit_offsets=self._visit_offsets,
+                     visits=self._visits, occupancy_offsets=self._occupancy_offsets,
+                     occupancy_nodes=self._occupancy_nodes,
+                     occupancy_counts=self._occupancy_counts)
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        """ The turns and agents of the indexed trajectory """
+        return self._shape
+
+    @property
+    def turns(self) -> int:
+        """ The number of indexed turns """
+        return len(self._occupancy_offsets) - 1
+
+    @property
+    def nodes(self) -> int:
+        """ The number of indexed nodes """
+        return len(self._first)
+
+    def first(self, node: int) -> int:
+        """ Get the turn a node was discovered
+
+        :node: The node
+        :returns: The first turn the node was visited (NEVER if not visited)
+
+        """
+        return int(self._first[node]) if 0 <= node < self.nodes else NEVER
+
+    def explorated(self, turn: int, node: int) -> bool:
+        """ Check if a node was discovered at a turn
+
+        :turn: The turn
+        :node: The node
+        :returns: If it was visited in the turn or before
+
+        """
+        first = self.first(node)
+        return first != NEVER and first <= turn
+
+    def explorated_mask(self, turn: int, mask: np.ndarray = None,
+                        mask_turn: int = None) -> np.ndarray:
+        """ Get if each node was discovered at a turn
+
+            The mask is rebuilt from the keyframe before the turn, or when
+            given the mask of a turn which is closer, by updating it with the
+            nodes discovered between the turns.
+
+        :turn: The turn
+        :mask: The mask of another turn, which is updated in place (None for none)
+        :mask_turn: The turn of the mask
+        :returns: If each node was visited in the turn or before
+
+        """
+        start = turn // self._keyframe * self._keyframe
+        if mask is None or abs(turn - mask_turn) > turn - start:
+            mask = np.unpackbits(self._keyframes[turn // self._keyframe],
+                                 count=self.nodes).astype(bool)
+            mask_turn = start
+
+        if turn >= mask_turn:
+            mask[self._delta(mask_turn, turn)] = True
+        else:
+            mask[self._delta(turn, mask_turn)] = False
+
+        return mask
+
+    def visits(self, node: int) -> np.ndarray:
+        """ Get the turns a node was visited
+
+        :node: The node
+        :returns: The sorted turns
+
+        """
+        if not 0 <= node < self.nodes:
+            return self._visits[:0]
+
+        return self._visits[self._visit_offsets[node]:self._visit_offsets[node + 1]]
+
+    def occupancy(self, turn: int) -> Tuple[np.ndarray, np.ndarray]:
+        """ Get the occupied nodes of a turn
+
+        :turn: The turn
+        :returns: The sorted occupied nodes and the number of agents at them
+
+        """
+        start, end = self._occupancy_offsets[turn], self._occupancy_offsets[turn + 1]
+
+        return self._occupancy_nodes[start:end], self._occupancy_counts[start:end]
+
+
+    def _delta(self, after: int, turn: int) -> np.ndarray:
+        """ Get the nodes discovered after a turn, until a turn
+
+        :after: The turn before the first turn (-1 for all)
+        :turn: The last turn
+        :returns: The nodes
+
+        """
+        return self._discoveries[self._discovery_offsets[after + 1]:self._discovery_offsets[turn + 1]]
+
+
+def _offsets(keys: np.ndarray, size: int) -> np.ndarray:
+    """ The start of each key in the sorted keys
+
+    :keys: The sorted keys
+    :size: The number of keys
+    :returns: The offsets (size + 1)
+
+    """
+    offsets = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=size), out=offsets[1:])
+
+    return offsets
@@ -0,0 +1,184 @@
+""" Running replicates of a script configuration in a process pool """
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
+import hashlib
+import logging
+import random as rnd
+
+from .script import load_script, ScriptError
+from .swarm import Swarm, SwarmSummary
+from .simulation import Simulator, SimulationResult
+from .store import ResultStore, configuration_hash
+
+
+# The script and world of the current worker process
+_worker = {}
+
+
+class ReplicateResult(object):
+
+    """ The result of a single replicate """
+
+    def __init__(self, seed: int, result: SimulationResult, summary: SwarmSummary):
+        """ Create the result
+
+        :seed: The agent seed of the replicate
+        :result: The result of the simulation
+        :summary: The summary of the swarm
+
+        """
+        self._seed = seed
+        self._result = result
+        self._summary = summary
+
+    @property
+    def seed(self) -> int:
+        """ The agent seed of the replicate """
+        return self._seed
+
+    @property
+    def result(self) -> SimulationResult:
+        """ The result of the simulation """
+        return self._result
+
+    @property
+    def summary(self) -> SwarmSummary:
+        """ The summary of the swarm """
+        return self._summary
+
+    def __str__(self):
+        return f"Replicate {self.seed}\n{self.result}\n{self.summary}"
+
+
+def run_replicate(script_module, world, seed: int) -> ReplicateResult:
+    """ Run a single replicate of a script in the current process
+
+        The world is reset and reused. Agents created without a seed draw
+        theirs from the global random module, which is seeded with the seed.
+
+    :script_module: The loaded script
+    :world: The world of the script
+    :seed: The agent seed
+    :returns: The result
+
+    """
+    world.reset()
+    rnd.seed(seed)
+
+    swarm = Swarm(script_module.agent_generator_list())
+    swarm.set_positions(0)
+
+    sim_args = {k: v for k, v in script_module.get_sim_args().items()
+                if k not in ("display", "speed")}
+    sim = Simulator(world, display=False, headless=True, **sim_args)
+    result = sim.start(swarm)
+
+    return ReplicateResult(seed, result, swarm.summary())
+
+
+def replicate(script: str, seeds: List[int], workers: int = 1,
+              script_args=(), store: str = None,
+              checkpoint: int = 100) -> List[ReplicateResult]:
+    """ Run replicates of a script with different agent seeds
+
+        Each worker process loads the script and generates the world once,
+        and reuses both for all its replicates. The simulations is run
+        headless, the video and data recorders of the script is not used.
+        The replicates is run in batches, each worker inserts the results of
+        a batch in the store at once.
+
+        Every run in the store is keyed by the hash of the script and its
+        arguments and the seed, the seeds which is already in the store is
+        skipped, so interrupted replicates is resumed by running them again.
+
+    :script: The filename of the script
+    :seeds: The agent seed of each replicate
+    :workers: The number of processes
+    :script_args: The arguments given to the args function of the script
+    :store: The filename of the ResultStore to save the results in (None to not save them)
+    :checkpoint: The maximum number of replicates in a batch, at most this
+                 many replicates of a worker is lost if the run is interrupted
+    :returns: The result of each replicate which was run, in the order of the seeds
+
+    """
+    assert workers > 0, "The number of workers must be a positive integer"
+    assert checkpoint > 0, "The checkpoint must be a positive integer"
+
+    seeds = list(seeds)
+    configuration = None
+    if store is not None:
+        configuration = _script_hash(script, script_args)
+        with ResultStore(store) as s:
+            completed = s.completed()
+        remaining = [seed for seed in seeds if (configuration, seed) not in completed]
+        if len(remaining) != len(seeds):
+            logging.warning(f"Skipping {len(seeds) - len(remaining)} replicates which is already in the store")
+        seeds = remaining
+
+    size = min(checkpoint, max(1, len(seeds) // (4 * workers)))
+    batches = [seeds[i:i + size] for i in range(0, len(seeds), size)]
+    initargs = (script, tuple(script_args), store, configuration)
+
+    if workers == 1:
+        _initialize_worker(*initargs)
+        try:
+            return [r for batch in batches for r in _run_batch(batch)]
+        finally:
+            if _worker["store"] is not None:
+                _worker["store"].close()
+            _worker.clear()
+
+    # Load the script before starting the workers, so a missing or invalid
+    # script raises a ScriptError instead of breaking the process pool
+    load_script(script, script_args)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_initialize_worker,
+                             initargs=initargs) as executor:
+        return [r for results in executor.map(_run_batch, batches) for r in results]
+
+
+def _script_hash(script: str, script_args) -> str:
+    """ Hash the configuration of a script
+
+    :script: The filename of the script
+    :script_args: The arguments given to the args function of the script
+    :returns: The hash of the content of the script and the arguments
+    :raises ScriptError: If the script is missing
+
+    """
+    try:
+        with open(script, "rb") as f:
+            content = hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        raise ScriptError(f"Could not find {script}")
+
+    return configuration_hash(script=content, args=list(script_args))
+
+
+def _initialize_worker(script: str, script_args: Tuple, store: str,
+                       configuration: str) -> None:
+    """ Load the script and generate the world in a worker process """
+    script_module = load_script(script, script_args)
+    _worker["name"] = script
+    _worker["configuration"] = configuration
+    _worker["script"] = script_module
+    _worker["world"] = script_module.world_generation()
+    _worker["store"] = None
+    if store is not None:
+        _worker["store"] = ResultStore(store)
+
+
+def _run_batch(seeds: List[int]) -> List[ReplicateResult]:
+    """ Run a batch of replicates in a worker process, and store the results """
+    results = [run_replicate(_worker["script"], _worker["world"], seed)
+               for seed in seeds]
+
+    store = _worker["store"]
+    if store is not None:
+        for r in results:
+            store.add(ResultStore.run(r.result, r.summary, name=_worker["name"],
+                                      configuration=_worker["configuration"],
+                                      seed=r.seed))
+        store.flush()
+
+    return results
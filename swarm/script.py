@@ -0,0 +1,43 @@
+""" Loading of experiment scripts """
+import importlib.machinery as imp
+import os
+
+
+REQUIRED_FUNCTIONS = {
+    "world_generation": "The script is missing the function world_generation, to generate the world",
+    "agent_generator_list": "The script is missing the function agent_generator_list, to generate list of geneators for the swarm",
+    "get_sim_args": "The script is missing the function get_sim_args, to get the arguments to the simulation",
+}
+
+
+class ScriptError(Exception):
+
+    """ The script could not be loaded """
+
+
+def load_script(filename: str, unknown=(), required=REQUIRED_FUNCTIONS):
+    """ Load an experiment script
+
+    :filename: The script
+    :unknown: The arguments given to the args function of the script
+    :required: The functions the script must define and the error if missing
+    :returns: The script module
+    :raises ScriptError: If the script is missing or invalid
+
+    """
+    if not os.path.exists(filename):
+        raise ScriptError(f"Could not find {filename}")
+
+    script_module_loader = imp.SourceFileLoader("script", filename)
+    script_module = script_module_loader.load_module()
+
+    if hasattr(script_module, "args"):
+        script_module.args(list(unknown))
+    elif len(unknown) != 0:
+        raise ScriptError(f"Unknown args {unknown}")
+
+    for function, message in required.items():
+        if not hasattr(script_module, function):
+            raise ScriptError(message)
+
+    return script_module
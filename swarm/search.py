@@ -0,0 +1,160 @@
+""" Adaptive search of the taus of the SimpleAgent with successive halving
+
+    Every simple agent configuration in a grid is a candidate. The candidates
+    is first run with a few replicates, then the worst is dropped and the
+    survivors is run with more replicates, until a single candidate is left
+    or the survivors has all the replicates of the grid. The candidates is
+    only compared with candidates of the same swarm size.
+"""
+from math import ceil
+from typing import Dict, List
+import logging
+
+from .sweep import SweepGrid, sweep
+from .store import ResultStore
+
+
+# The metrics to minimize, by the column of the result store
+METRICS = {
+    "turns": "turns",
+    "distance": "mean_distance",
+}
+
+
+class Candidate(object):
+
+    """ A agent configuration in the search """
+
+    def __init__(self, agent: Dict):
+        """ Create the candidate
+
+        :agent: The agent type and parameters
+
+        """
+        self._agent = agent
+        self._values = {}
+
+    @property
+    def agent(self) -> Dict:
+        """ The agent type and parameters """
+        return self._agent
+
+    @property
+    def replicates(self) -> int:
+        """ The number of runs of the candidate """
+        return len(self._values)
+
+    @property
+    def score(self) -> float:
+        """ The mean of the metric over all the runs (lower is better) """
+        return sum(self._values.values()) / len(self._values)
+
+    def add(self, key, value: float) -> None:
+        """ Add the metric of a run
+
+        :key: The configuration hash and seed of the run
+        :value: The metric
+
+        """
+        self._values[key] = value
+
+    def __str__(self):
+        taus = ", ".join(f"{t}: {self._agent.get(t)}" for t in ("tau_1", "tau_2", "tau_3"))
+        return f"{taus} score {self.score} ({self.replicates} runs)"
+
+
+def successive_halving(grid: SweepGrid, metric: str = "turns", eta: int = 3,
+                       min_replicates: int = 2, workers: int = 1,
+                       store: str = None, checkpoint: int = 100) -> Dict[int, List[Candidate]]:
+    """ Search the best taus of the simple agents in a grid
+
+        A rung runs every survivor with the missing replicates, the candidates
+        is ranked by the mean of the metric and the best 1/eta is kept. The
+        number of replicates is multiplied by eta for every rung, and limited
+        by the replicates of the grid. The runs land in the store like a
+        sweep, and runs already in the store is reused.
+
+    :grid: The grid, only the simple agents is searched
+    :metric: The metric to minimize (see METRICS)
+    :eta: The reduction factor of the candidates of each rung
+    :min_replicates: The number of replicates of the first rung
+    :workers: The number of processes
+    :store: The filename of the ResultStore to save the results in (None to not save them)
+    :checkpoint: The maximum number of replicates between the saves of a worker
+    :returns: The survivors of the last rung of each swarm size, best first
+
+    """
+    assert metric in METRICS, f"The metric must be one of {list(METRICS)}"
+    assert eta > 1, "The reduction factor must be larger than one"
+    assert min_replicates > 0, "The minimum replicates must be a positive integer"
+
+    candidates = [Candidate(agent) for agent in grid.agents()
+                  if agent["agent"] == "simple"]
+    if not candidates:
+        raise ValueError("The grid has no simple agents")
+
+    seeds = grid.seeds
+    replicates = min(min_replicates, len(seeds))
+    done = 0
+
+    survivors = {}
+    for candidate in candidates:
+        survivors.setdefault(candidate.agent["count"], []).append(candidate)
+
+    while True:
+        alive = [c for group in survivors.values() for c in group]
+        logging.warning(f"Running {len(alive)} candidates with {replicates} replicates")
+
+        results = sweep(grid, workers, store, checkpoint,
+                        agents=[c.agent for c in alive],
+                        seeds=seeds[done:replicates])
+        _score(grid, alive, results, metric, store, seeds[:replicates])
+
+        finished = replicates == len(seeds)
+        for count, group in survivors.items():
+            group.sort(key=lambda c: c.score)
+            if not finished:
+                survivors[count] = group[:ceil(len(group) / eta)]
+
+        if finished or all(len(group) == 1 for group in survivors.values()):
+            return survivors
+
+        done = replicates
+        replicates = min(replicates * eta, len(seeds))
+
+
+def _score(grid: SweepGrid, candidates: List[Candidate], results, metric: str,
+           store: str, seeds: List[int]) -> None:
+    """ Add the metric of the runs to the candidates
+
+        The runs which was skipped by the sweep, as they were already in the
+        store, is read from the store.
+
+    :grid: The grid
+    :candidates: The candidates
+    :results: The results of the sweep
+    :metric: The metric
+    :store: The filename of the ResultStore
+    :seeds: The seeds of the runs
+
+    """
+    worlds = grid.worlds()
+    by_configuration = {}
+    for candidate in candidates:
+        for world in worlds:
+            by_configuration[grid.configuration(world, candidate.agent)] = candidate
+
+    for r in results:
+        value = r.result.turns if metric == "turns" else r.summary.mean
+        configuration = grid.configuration(r.world, r.agent)
+        by_configuration[configuration].add((configuration, r.seed), value)
+
+    if store is None:
+        return
+
+    with ResultStore(store) as s:
+        runs = s.query(("configuration", "seed", METRICS[metric]),
+                       configuration=list(by_configuration), seed=list(seeds))
+
+    for configuration, seed, value in zip(*runs.values()):
+        by_configuration[configuration].add((configuration, int(seed)), float(value))
@@ -1,11 +1,10 @@
 """ Run the simulation """
 import logging
-import matplotlib.pyplot as plt
 from typing import List
 
 from .world import World
 from .swarm import Swarm
-from .recording import DummyRecorder
+from .recording import DummyRecorder, OfflineVideoRecorder, DummyDataRecorder
 
 
 class SimulationResult(object):
@@ -73,21 +72,50 @@ class Simulator(object):
     """ The Simulator"""
 
     def __init__(self, world: World, display=True, speed=-1, max_turns=100,
-                 recording=DummyRecorder()):
+                 recording=DummyRecorder(), headless=False, data_recorder=None):
         """ Create the simulator
 
         :world: TODO
         :display: TODO
         :speed:
             :recording: Record the process to the file
+        :headless: Run without display, recording and delay, the plotting
+                   code is never imported
+        :data_recorder: Given the data of every turn (None for no per turn data),
+                        the results is still saved by its save function
 
         """
+        if headless and (display or not isinstance(recording, DummyRecorder)):
+            logging.warning("Running headless, display and recording is disabled")
+
         self._world = world
-        self._display = display
-        self._speed = speed
+        self._display = display and not headless
+        self._speed = -1 if headless else speed
         self._turns = -1
         self._max_turns = max_turns
-        self._recorder = recording
+        self._recorder = DummyRecorder() if headless else recording
+        self._data_recorder = DummyDataRecorder() if data_recorder is None else data_recorder
+        self._trace = False
+
+    @staticmethod
+    def replicate(script: str, seeds: List[int], workers: int = 1, script_args=(),
+                  store: str = None, checkpoint: int = 100):
+        """ Run replicates of a script with different agent seeds in a process pool
+
+            See swarm.replicate.replicate
+
+        :script: The filename of the script
+        :seeds: The agent seed of each replicate
+        :workers: The number of processes
+        :script_args: The arguments given to the args function of the script
+        :store: The filename of the ResultStore to save the results in, the
+                seeds already in it is skipped (None to not save them)
+        :checkpoint: The maximum number of replicates between the saves of a worker
+        :returns: The ReplicateResult of each replicate which was run
+
+        """
+        from .replicate import replicate
+        return replicate(script, seeds, workers, script_args, store, checkpoint)
 
     def start(self, swarm: Swarm):
         """ Start the simulating
@@ -96,13 +124,15 @@ class Simulator(object):
 
         """
         self._interrupt = False
+        # Formatting the per turn debug messages is skipped unless enabled
+        self._trace = logging.getLogger().isEnabledFor(logging.DEBUG)
         logging.info("Getting the initialize position of the swarm agents")
         self._agents_positions, count_position = swarm.get_positions()
 
         self._result = SimulationResult()
 
-        for p, l in zip(self._agents_positions, count_position):
-            self._world.update_value(p, "agents", l)
+        self._world.set_agents_many(self._agents_positions, count_position)
+        self._data_recorder.start(self, swarm)
 
         logging.info("Starting the simulation")
 
@@ -119,9 +149,11 @@ class Simulator(object):
 
         """
         size = self._world.size()
-        logging.debug(f"Explorated nodes: {self._explorated}, Total number of nodes: {size}")
+        explorated = self._world.explorated_count()
+        if self._trace:
+            logging.debug(f"Explorated nodes: {explorated}, Total number of nodes: {size}")
 
-        return not (self._explorated < size - 1 and self._turns < self._max_turns)
+        return not (explorated < size - 1 and self._turns < self._max_turns)
 
     def get_results(self) -> SimulationResult:
         """ Get the result of simulation """
@@ -129,11 +161,13 @@ class Simulator(object):
 
     def display(self):
         """ Show the world """
+        if isinstance(self._recorder, OfflineVideoRecorder):
+            self._recorder.log(self._world, self._turns, self._explorated)
+
         if self._display:
-            plt.clf()
-            plt.title(f"Turn: {self._turns}, Visisted nodes: {self._explorated}")
-            self._world.view(False)
-            plt.draw()
+            import matplotlib.pyplot as plt
+            # Only the changed parts of the world is redrawn
+            self._world.view(False, title=f"Turn: {self._turns}, Visisted nodes: {self._explorated}")
             self._recorder.record(plt.gcf())
 
     def interrupt(self):
@@ -143,6 +177,7 @@ class Simulator(object):
     def sleep(self):
         """ Sleep for a time step """
         if self._speed > -1:
+            import matplotlib.pyplot as plt
             plt.pause(self._speed)
 
     def _main_loop(self, swarm: Swarm) -> None:
@@ -157,15 +192,17 @@ class Simulator(object):
         self._explorated = 0
 
         while not self.stop() and not self._interrupt:
-            logging.debug(f"Turn {self._turns} is now running")
+            if self._trace:
+                logging.debug(f"Turn {self._turns} is now running")
             self.display()
             self._turn(swarm)
             self._turns += 1
             self.sleep()
 
         logging.info("Simulation is done")
+        self.display()
         if self._display:
-            self.display()
+            import matplotlib.pyplot as plt
             plt.show()
 
     def _turn(self, swarm: Swarm):
@@ -176,18 +213,20 @@ class Simulator(object):
         :swarm: The swarm to use
 
         """
-        logging.debug("Reseting the agents position in the  map")
-        for p in self._agents_positions:
-            self._world.update_value(p, "agents", 0)
+        if self._trace:
+            logging.debug("Reseting the agents position in the  map")
+        self._world.set_agents_many(self._agents_positions, 0)
 
         new_explorated = swarm.move_all(self._world)
         self._explorated += new_explorated
 
         self._result.discovered_append(new_explorated)
 
-        logging.debug("Adding the agents new position to the map")
+        if self._trace:
+            logging.debug("Adding the agents new position to the map")
 
         self._agents_positions, count_position = swarm.get_positions()
 
-        for p, l in zip(self._agents_positions, count_position):
-            self._world.update_value(p, "agents", l)
+        self._world.set_agents_many(self._agents_positions, count_position)
+
+        self._data_recorder.turn(self, swarm)
@@ -0,0 +1,285 @@
+""" Storing the results of simulations in a SQLite database """
+from typing import Dict, List, Set, Tuple
+import hashlib
+import json
+import sqlite3
+import numpy as np
+
+from .simulation import SimulationResult
+from .swarm import SwarmSummary
+
+
+# The metadata columns of the runs and their SQLite types
+COLUMNS = {
+    "name": "TEXT",
+    "configuration": "TEXT",
+    "agent": "TEXT",
+    "agents": "INTEGER",
+    "tau_1": "REAL",
+    "tau_2": "REAL",
+    "tau_3": "REAL",
+    "min_nodes": "INTEGER",
+    "max_nodes": "INTEGER",
+    "edge_multiplier": "REAL",
+    "min_cost": "REAL",
+    "max_cost": "REAL",
+    "world_seed": "INTEGER",
+    "nodes": "INTEGER",
+    "seed": "INTEGER",
+    "turns": "INTEGER",
+    "explorated": "INTEGER",
+    "lowest_distance": "REAL",
+    "mean_distance": "REAL",
+    "std_distance": "REAL",
+    "highest_distance": "REAL",
+}
+
+# The array columns of the runs and the type of their elements
+ARRAYS = {
+    "discovered": np.int32,
+    "distances": np.float64,
+}
+
+INDEXES = {
+    "runs_configuration": ("agent", "agents", "tau_1", "tau_2", "tau_3"),
+    "runs_world": ("world_seed", "nodes"),
+    "runs_seed": ("seed",),
+    "runs_completed": ("configuration", "seed"),
+}
+
+
+class ResultStore(object):
+
+    """ The results of many simulations in a single SQLite file
+
+        Every run is a row, the metadata is stored in indexed columns and
+        the per turn discovered nodes and the traveling distance of each
+        agent is stored as compact blobs. Runs is buffered and inserted in
+        batches, in a single transaction.
+
+        Several processes can write to the same file at once, each process
+        must open its own store.
+    """
+
+    def __init__(self, filename: str, batch_size: int = 1000, timeout: float = 60):
+        """ Open or create the store
+
+        :filename: The database file
+        :batch_size: The number of runs buffered before they are inserted
+        :timeout: The time in seconds to wait for the other writers
+
+        """
+        self._filename = filename
+        self._batch_size = batch_size
+        self._pending = []
+
+        self._connection = sqlite3.connect(filename, timeout=timeout)
+        # Readers is not blocked by the writer, and writes is only synced at
+        # checkpoints
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+
+        columns = [f"{name} {kind}" for name, kind in COLUMNS.items()]
+        columns += [f"{name} BLOB" for name in ARRAYS]
+        with self._connection:
+            self._connection.execute(f"CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, {', '.join(columns)})")
+
+            # Add the columns missing in stores created by older versions
+            existing = {row[1] for row in self._connection.execute("PRAGMA table_info(runs)")}
+            for column in columns:
+                if column.split()[0] not in existing:
+                    self._connection.execute(f"ALTER TABLE runs ADD COLUMN {column}")
+
+            for index, indexed in INDEXES.items():
+                self._connection.execute(f"CREATE INDEX IF NOT EXISTS {index} ON runs ({', '.join(indexed)})")
+
+    @staticmethod
+    def run(result: SimulationResult, summary: SwarmSummary, **metadata) -> Dict:
+        """ Create the row of a run
+
+        :result: The result of the simulation
+        :summary: The summary of the swarm
+        :metadata: The other columns of the run (see COLUMNS)
+        :returns: The row
+
+        """
+        row = dict(metadata)
+        row.update({
+            "nodes": result.nodes,
+            "turns": result.turns,
+            "explorated": int(sum(result.discovered)),
+            "agents": row.get("agents", len(summary.raw)),
+            "lowest_distance": summary.lowest,
+            "mean_distance": summary.mean,
+            "std_distance": summary.std,
+            "highest_distance": summary.highest,
+            "discovered": result.discovered,
+            "distances": summary.raw,
+        })
+
+        return row
+
+    def add(self, row: Dict) -> None:
+        """ Add a run, it is inserted when the buffer is full or on flush
+
+        :row: The run (see run)
+
+        """
+        unknown = set(row) - set(COLUMNS) - set(ARRAYS)
+        if unknown:
+            raise KeyError(f"Unknown columns {sorted(unknown)}")
+
+        self._pending.append(row)
+        if len(self._pending) >= self._batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """ Insert the buffered runs in a single transaction """
+        if not self._pending:
+            return
+
+        names = list(COLUMNS) + list(ARRAYS)
+        values = [[row.get(name) for name in COLUMNS] +
+                  [_to_blob(row.get(name), dtype) for name, dtype in ARRAYS.items()]
+                  for row in self._pending]
+
+        with self._connection:
+            self._connection.executemany(
+                f"INSERT INTO runs ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})",
+                values)
+
+        self._pending.clear()
+
+    def completed(self) -> Set[Tuple[str, int]]:
+        """ Get the finished work, the runs which has a configuration hash
+
+        :returns: The configuration hash and the seed of each run
+
+        """
+        return set(self._connection.execute(
+            "SELECT configuration, seed FROM runs WHERE configuration IS NOT NULL"))
+
+    def query(self, columns=tuple(COLUMNS), **where) -> Dict[str, np.ndarray]:
+        """ Get the metadata of the runs matching the filter
+
+            Missing integers is returned as -1, missing reals as nan.
+
+        :columns: The columns to get
+        :where: The value of a column, or a list of the allowed values
+        :returns: An array of the values of each column, ordered by insertion
+
+        """
+        for name in columns:
+            if name not in COLUMNS:
+                raise KeyError(f"Unknown column {name}")
+
+        rows = self._select(columns, where)
+
+        arrays = {}
+        for i, name in enumerate(columns):
+            values = [row[i] for row in rows]
+            if COLUMNS[name] == "INTEGER":
+                arrays[name] = np.array([-1 if v is None else v for v in values], dtype=np.int64)
+            elif COLUMNS[name] == "REAL":
+                arrays[name] = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+            else:
+                arrays[name] = np.array(["" if v is None else v for v in values], dtype=str)
+
+        return arrays
+
+    def arrays(self, column: str, **where) -> List[np.ndarray]:
+        """ Get an array column of the runs matching the filter
+
+        :column: The column (see ARRAYS)
+        :where: The value of a column, or a list of the allowed values
+        :returns: The array of each run, ordered by insertion
+
+        """
+        if column not in ARRAYS:
+            raise KeyError(f"Unknown array {column}")
+
+        return [np.frombuffer(row[0], dtype=ARRAYS[column])
+                for row in self._select((column,), where)]
+
+    def discovered(self, **where) -> np.ndarray:
+        """ Get the discovered nodes of each turn for the runs matching the filter
+
+        :where: The value of a column, or a list of the allowed values
+        :returns: A matrix with a row for each run, runs which finished
+                  earlier is padded with zeros
+
+        """
+        discovered = self.arrays("discovered", **where)
+        matrix = np.zeros((len(discovered), max(map(len, discovered), default=0)),
+                          dtype=ARRAYS["discovered"])
+        for i, d in enumerate(discovered):
+            matrix[i, :len(d)] = d
+
+        return matrix
+
+    def close(self) -> None:
+        """ Insert the buffered runs and close the database """
+        self.flush()
+        self._connection.close()
+
+    def __len__(self):
+        return self._connection.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _select(self, columns, where: Dict) -> List:
+        """ Select columns of the runs matching the filter
+
+        :columns: The columns
+        :where: The value of a column, or a list of the allowed values
+        :returns: The rows
+
+        """
+        conditions = []
+        parameters = []
+        for name, value in where.items():
+            if name not in COLUMNS:
+                raise KeyError(f"Unknown column {name}")
+
+            if value is None:
+                conditions.append(f"{name} IS NULL")
+            elif isinstance(value, (list, tuple, np.ndarray)):
+                conditions.append(f"{name} IN ({', '.join('?' * len(value))})")
+                parameters.extend(_to_sql(v) for v in value)
+            else:
+                conditions.append(f"{name} = ?")
+                parameters.append(_to_sql(value))
+
+        sql = f"SELECT {', '.join(columns)} FROM runs"
+        if conditions:
+            sql += f" WHERE {' AND '.join(conditions)}"
+
+        return self._connection.execute(sql + " ORDER BY id", parameters).fetchall()
+
+
+def configuration_hash(**parameters) -> str:
+    """ Hash the parameters of a configuration
+
+        The parameters must be JSON serializable, the order of them does not
+        change the hash.
+
+    :parameters: The parameters which determine the result, except the seed
+    :returns: The hash
+
+    """
+    text = json.dumps(parameters, sort_keys=True, default=list)
+    return hashlib.sha256(text.encode()).hexdigest()[:32]
+
+
+def _to_blob(values, dtype) -> bytes:
+    """ Pack an array as a blob """
+    return None if values is None else np.asarray(values, dtype=dtype).tobytes()
+
+
+def _to_sql(value):
+    """ Convert NumPy scalars to Python values """
+    return value.item() if isinstance(value, np.generic) else value
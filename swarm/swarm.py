@@ -1,7 +1,22 @@
 """ Swarm """
 from typing import Callable as Func, List, Tuple
 from statistics import mean, stdev
+import numpy as np
 from swarm.world import color
+from .agents import MovementLog
+
+
+def count_positions(positions) -> Tuple[np.ndarray, np.ndarray]:
+    """ Count the number of agents at each occupied node
+
+    :positions: The position of every agent
+    :returns: The occupied nodes and the number of agents at them
+
+    """
+    counts = np.bincount(np.asarray(positions, dtype=np.int64))
+    nodes = np.flatnonzero(counts)
+
+    return nodes, counts[nodes]
 
 
 class SwarmSummary(object):
@@ -32,6 +47,11 @@ class SwarmSummary(object):
         self._std = std
         self._highest = highest
 
+    @property
+    def raw(self) -> List[float]:
+        """ Get the traveling distance of every agent """
+        return self._raw
+
     @property
     def lowest(self) -> float:
         """ Get the lowest """
@@ -65,7 +85,8 @@ class Swarm(object):
         self._generator = agent_generators
 
         self._agents = []
-        self._positions = {}
+        self._nodes = np.zeros(0, dtype=np.int64)
+        self._counts = np.zeros(0, dtype=np.int64)
 
         self.create_swarm()
 
@@ -89,24 +110,18 @@ class Swarm(object):
         :returns: The amount of new explorated nodes
 
         """
-        positions = {}
-        agent_movement = []
+        positions = []
+        agent_movement = MovementLog(world)
 
         for agent in self._agents:
             old_pos = agent.position
             pos = agent.move(world, agent_movement)
             agent_movement.append([old_pos, pos])
-            positions.setdefault(str(pos), 0)
-            positions[str(pos)] += 1
-
-        new_explorated = 0
-        for k in positions.keys():
-            new_explorated += int(world.explore(k))
+            positions.append(pos)
 
-        self._positions.clear()
-        self._positions = positions
+        self._nodes, self._counts = count_positions(positions)
 
-        return new_explorated
+        return world.explore_many(self._nodes)
 
     def set_positions(self, position: int) -> None:
         """ Set the same position for all agents in swarm
@@ -117,15 +132,29 @@ class Swarm(object):
         for agent in self._agents:
             agent.position = position
 
-        self._positions.clear()
-        self._positions[str(position)] = len(self._agents)
+        self._nodes = np.array([position], dtype=np.int64)
+        self._counts = np.array([len(self._agents)], dtype=np.int64)
 
-    def get_positions(self) -> Tuple[List[int], List[int]]:
+    def get_positions(self) -> Tuple[np.ndarray, np.ndarray]:
         """ Get the position of the swarm
         :returns: The position and the number of agent in different positions
 
         """
-        return self._positions.keys(), self._positions.values()
+        return self._nodes, self._counts
+
+    @property
+    def positions(self) -> np.ndarray:
+        """ The position of every agent """
+        return np.array([a.position for a in self._agents], dtype=np.int64)
+
+    def pop_records(self) -> List[Tuple[int, dict]]:
+        """ Get the records of the agents since the last call and forget them
+
+        :returns: The index and record of each record, ordered by agent
+
+        """
+        return [(i, r) for i, agent in enumerate(self._agents)
+                for r in agent.pop_records()]
 
     def summary(self) -> SwarmSummary:
         """ Get the summary of the swarm
@@ -148,10 +177,4 @@ class Swarm(object):
         """ Get the position from the agent
         (this is only used for getting the initialize position)
         """
-        self._positions.clear()
-
-        for agent in self._agents:
-            pos = agent.position
-
-            self._positions.setdefault(str(pos), 0)
-            self._positions[str(pos)] += 1
+        self._nodes, self._counts = count_positions([a.position for a in self._agents])
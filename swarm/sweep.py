@@ -0,0 +1,419 @@
+""" Parameter sweeps over worlds, agents and seeds
+
+    A sweep is described by a declarative grid, e.g. in YAML:
+
+        world:
+          nodes: [[20, 50]]
+          edge_multiplier: [1]
+          edge_cost: [[1, 10]]
+          seed: [0, 1]
+        agents:
+          simple:
+            count: [2, 5]
+            tau_1: [0.2, 0.4]
+            tau_2: [0.2]
+            tau_3: [0.1]
+          random:
+            count: [2, 5]
+        replicates: 30
+        first_seed: 0
+        max_turns: 100
+        vectorized: false
+
+    Every value in world and agents is a list of the values to sweep over
+    (a single value is also accepted). The grid is the product of the world
+    and agent parameters, each configuration is run with the agent seeds
+    first_seed, ..., first_seed + replicates - 1.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+import logging
+from typing import Dict, List, Tuple
+
+from .world import World, WorldGenerator
+from .agents import random_agent_generator, simple_agent_generator
+from .swarm import Swarm, SwarmSummary
+from .vector_swarm import VectorSwarm
+from .simulation import Simulator, SimulationResult
+from .replicate import ReplicateResult
+from .store import ResultStore, configuration_hash
+
+
+WORLD_PARAMETERS = ("nodes", "edge_multiplier", "edge_cost", "seed")
+
+AGENT_PARAMETERS = {
+    "simple": ("count", "tau_1", "tau_2", "tau_3"),
+    "random": ("count",),
+}
+
+# The worlds and the settings of the sweep in the current worker process
+_worker = {}
+
+
+class SweepResult(ReplicateResult):
+
+    """ The result of a single replicate of a configuration in a sweep """
+
+    def __init__(self, world: Dict, agent: Dict, seed: int,
+                 result: SimulationResult, summary: SwarmSummary):
+        """ Create the result
+
+        :world: The parameters of the world
+        :agent: The parameters of the agents
+        :seed: The agent seed of the replicate
+        :result: The result of the simulation
+        :summary: The summary of the swarm
+
+        """
+        ReplicateResult.__init__(self, seed, result, summary)
+        self._world = world
+        self._agent = agent
+
+    @property
+    def world(self) -> Dict:
+        """ The parameters of the world """
+        return self._world
+
+    @property
+    def agent(self) -> Dict:
+        """ The parameters of the agents """
+        return self._agent
+
+    def __str__(self):
+        return f"World {self.world}\nAgents {self.agent}\n{ReplicateResult.__str__(self)}"
+
+
+class SweepGrid(object):
+
+    """ A declarative grid of world and agent parameters """
+
+    def __init__(self, grid: Dict, name: str = "sweep"):
+        """ Create the grid
+
+        :grid: The grid, see the module documentation for the format
+        :name: The name of the sweep in the result store
+
+        """
+        self._name = name
+        world = grid.get("world", {})
+        for parameter in ("nodes", "edge_cost"):
+            if parameter not in world:
+                raise ValueError(f"The grid is missing the world parameter {parameter}")
+
+        # A range is a pair, a single range is accepted in place of a list
+        self._world = {
+            "nodes": _ranges(world["nodes"]),
+            "edge_multiplier": _values(world.get("edge_multiplier", 1)),
+            "edge_cost": _ranges(world["edge_cost"]),
+            "seed": _values(world.get("seed", 0)),
+        }
+
+        self._agents = {}
+        for agent, parameters in grid.get("agents", {}).items():
+            if agent not in AGENT_PARAMETERS:
+                raise ValueError(f"Unknown agent {agent}, the agents is {list(AGENT_PARAMETERS)}")
+
+            if "count" not in parameters:
+                raise ValueError(f"The grid is missing the count of the agent {agent}")
+
+            unknown = set(parameters) - set(AGENT_PARAMETERS[agent]) - {"conf"}
+            if unknown:
+                raise ValueError(f"Unknown parameters {sorted(unknown)} for the agent {agent}")
+
+            self._agents[agent] = {p: _values(parameters[p])
+                                   for p in AGENT_PARAMETERS[agent]
+                                   if p in parameters}
+            self._agents[agent]["conf"] = [parameters.get("conf", {})]
+
+        if not self._agents:
+            raise ValueError("The grid has no agents")
+
+        self._replicates = int(grid.get("replicates", 1))
+        self._first_seed = int(grid.get("first_seed", 0))
+        self._max_turns = int(grid.get("max_turns", 100))
+        self._vectorized = bool(grid.get("vectorized", False))
+
+    @classmethod
+    def load(cls, filename: str):
+        """ Load a grid from a YAML file
+
+        :filename: The file
+        :returns: The grid
+
+        """
+        import yaml
+        with open(filename, "r") as f:
+            return cls(yaml.safe_load(f), filename)
+
+    @property
+    def name(self) -> str:
+        """ The name of the sweep in the result store """
+        return self._name
+
+    @property
+    def seeds(self) -> List[int]:
+        """ The agent seeds of the replicates """
+        return list(range(self._first_seed, self._first_seed + self._replicates))
+
+    @property
+    def max_turns(self) -> int:
+        """ The maximum number of turns of a simulation """
+        return self._max_turns
+
+    @property
+    def vectorized(self) -> bool:
+        """ Use the struct of arrays swarm engine """
+        return self._vectorized
+
+    def worlds(self) -> List[Dict]:
+        """ The parameters of every world in the grid
+
+        :returns: The keyword arguments of each WorldGenerator
+
+        """
+        return [dict(zip(WORLD_PARAMETERS, values))
+                for values in product(*(self._world[p] for p in WORLD_PARAMETERS))]
+
+    def agents(self) -> List[Dict]:
+        """ The parameters of every agent configuration in the grid
+
+        :returns: The agent type and parameters of each configuration
+
+        """
+        configurations = []
+        for agent, parameters in self._agents.items():
+            names = list(parameters)
+            for values in product(*(parameters[p] for p in names)):
+                configuration = {"agent": agent}
+                configuration.update(zip(names, values))
+                configurations.append(configuration)
+
+        return configurations
+
+    def configuration(self, world: Dict, agent: Dict) -> str:
+        """ The hash of a configuration, which keys its runs in the result store
+
+        :world: The parameters of the world
+        :agent: The agent type and parameters
+        :returns: The hash
+
+        """
+        return configuration_hash(world=world, agent=agent,
+                                  max_turns=self._max_turns,
+                                  vectorized=self._vectorized)
+
+    def __len__(self):
+        return len(self.worlds()) * len(self.agents()) * self._replicates
+
+
+def sweep(grid: SweepGrid, workers: int = 1, store: str = None,
+          checkpoint: int = 100, agents: List[Dict] = None,
+          seeds: List[int] = None) -> List[SweepResult]:
+    """ Run every configuration of a grid with every agent seed
+
+        Each world is generated once and shared by all the configurations
+        and replicates that use it. The worlds is generated in a process
+        pool, and is then given to the worker processes once, when they
+        start. The simulations is run headless, in batches, each worker
+        inserts the results of a batch in the store at once.
+
+        Every run in the store is keyed by the hash of its configuration and
+        its seed, the replicates which is already in the store is skipped,
+        so an interrupted sweep is resumed by running it again.
+
+    :grid: The grid
+    :workers: The number of processes
+    :store: The filename of the ResultStore to save the results in (None to not save them)
+    :checkpoint: The maximum number of replicates in a batch, at most this
+                 many replicates of a worker is lost if the sweep is interrupted
+    :agents: The agent configurations to run (None for all in the grid)
+    :seeds: The agent seeds to run (None for the seeds of the grid)
+    :returns: The result of each replicate which was run, ordered by world,
+              agent configuration and seed
+
+    """
+    assert workers > 0, "The number of workers must be a positive integer"
+    assert checkpoint > 0, "The checkpoint must be a positive integer"
+
+    agents = grid.agents() if agents is None else agents
+    seeds = grid.seeds if seeds is None else seeds
+
+    worlds = grid.worlds()
+    tasks = []
+    for w, world in enumerate(worlds):
+        for agent in agents:
+            configuration = grid.configuration(world, agent)
+            tasks.extend((w, agent, seed, configuration) for seed in seeds)
+
+    if store is not None:
+        with ResultStore(store) as s:
+            completed = s.completed()
+        remaining = [t for t in tasks if (t[3], t[2]) not in completed]
+        if len(remaining) != len(tasks):
+            logging.warning(f"Skipping {len(tasks) - len(remaining)} replicates which is already in the store")
+        tasks = remaining
+
+    settings = {"name": grid.name, "max_turns": grid.max_turns,
+                "vectorized": grid.vectorized, "store": store}
+
+    size = min(checkpoint, max(1, len(tasks) // (4 * workers)))
+    batches = [tasks[i:i + size] for i in range(0, len(tasks), size)]
+
+    # Only the worlds which is still used is generated
+    used = sorted({t[0] for t in tasks})
+
+    if workers == 1:
+        maps = {w: _generate_world(worlds[w]) for w in used}
+        _initialize_worker(worlds, maps, settings)
+        try:
+            return [r for batch in batches for r in _run_batch(batch)]
+        finally:
+            if _worker["store"] is not None:
+                _worker["store"].close()
+            _worker.clear()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        maps = dict(zip(used, executor.map(_generate_world, [worlds[w] for w in used])))
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_initialize_worker,
+                             initargs=(worlds, maps, settings)) as executor:
+        return [r for results in executor.map(_run_batch, batches) for r in results]
+
+
+def agent_generators(agent: Dict, seed: int) -> List[Tuple[int, object]]:
+    """ Create the agent generators of a configuration
+
+    :agent: The agent type and parameters of the configuration
+    :seed: The agent seed
+    :returns: The generators for the swarm
+
+    """
+    if agent["agent"] == "simple":
+        conf = dict(agent["conf"])
+        for tau in ("tau_1", "tau_2", "tau_3"):
+            if tau in agent:
+                conf[tau] = agent[tau]
+        gen = simple_agent_generator(conf, seed=seed)
+    else:
+        gen = random_agent_generator(agent["conf"], seed=seed)
+
+    return [[agent["count"], gen]]
+
+
+def _values(value) -> List:
+    """ A list of values, a single value is put in a list """
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def _ranges(value) -> List[Tuple]:
+    """ A list of ranges, a single range is put in a list """
+    value = _values(value)
+    if len(value) == 2 and not isinstance(value[0], (list, tuple)):
+        value = [value]
+
+    return [tuple(r) for r in value]
+
+
+def _generate_world(world: Dict):
+    """ Generate a world in a worker process
+
+    :world: The keyword arguments of the WorldGenerator
+    :returns: The navigation map of the world
+
+    """
+    return WorldGenerator(world["nodes"], world["edge_multiplier"],
+                          world["edge_cost"], world["seed"]).generate().navigation_csr
+
+
+def _initialize_worker(worlds: List[Dict], maps: Dict, settings: Dict) -> None:
+    """ Store the worlds of the sweep in a worker process
+
+    :worlds: The parameters of each world
+    :maps: The navigation map of each used world, by its index
+    :settings: The name of the sweep, the maximum number of turns, if the
+               swarm is vectorized and the filename of the store
+
+    """
+    _worker["worlds"] = worlds
+    _worker["maps"] = maps
+    _worker["settings"] = settings
+    _worker["cache"] = {}
+    _worker["store"] = None
+    if settings["store"] is not None:
+        _worker["store"] = ResultStore(settings["store"])
+
+
+def _run_batch(tasks: List[Tuple[int, Dict, int, str]]) -> List[SweepResult]:
+    """ Run a batch of replicates in a worker process, and store the results
+
+    :tasks: The index of the world, the agent configuration, the agent seed
+            and the configuration hash of each replicate
+    :returns: The results
+
+    """
+    results = [_run_task(task) for task in tasks]
+
+    store = _worker["store"]
+    if store is not None:
+        for task, r in zip(tasks, results):
+            store.add(ResultStore.run(r.result, r.summary, configuration=task[3],
+                                      **_metadata(_worker["settings"]["name"], r)))
+        store.flush()
+
+    return results
+
+
+def _metadata(name: str, result: SweepResult) -> Dict:
+    """ The metadata of a replicate for the store
+
+    :name: The name of the sweep
+    :result: The result of the replicate
+    :returns: The columns of the run
+
+    """
+    world, agent = result.world, result.agent
+    return {
+        "name": name,
+        "agent": agent["agent"],
+        "agents": agent["count"],
+        "tau_1": agent.get("tau_1"),
+        "tau_2": agent.get("tau_2"),
+        "tau_3": agent.get("tau_3"),
+        "min_nodes": world["nodes"][0],
+        "max_nodes": world["nodes"][1],
+        "edge_multiplier": world["edge_multiplier"],
+        "min_cost": world["edge_cost"][0],
+        "max_cost": world["edge_cost"][1],
+        "world_seed": world["seed"],
+        "seed": result.seed,
+    }
+
+
+def _run_task(task: Tuple[int, Dict, int, str]) -> SweepResult:
+    """ Run a replicate of a configuration in a worker process
+
+    :task: The index of the world, the agent configuration, the agent seed
+           and the configuration hash
+    :returns: The result
+
+    """
+    index, agent, seed, _ = task
+    settings = _worker["settings"]
+
+    cache = _worker["cache"]
+    if index not in cache:
+        cache[index] = World.from_csr(_worker["maps"][index])
+    world = cache[index]
+    world.reset()
+
+    generators = agent_generators(agent, seed)
+    if settings["vectorized"]:
+        swarm = VectorSwarm(generators, seed=seed)
+    else:
+        swarm = Swarm(generators)
+    swarm.set_positions(0)
+
+    sim = Simulator(world, display=False, max_turns=settings["max_turns"], headless=True)
+    result = sim.start(swarm)
+
+    return SweepResult(_worker["worlds"][index], agent, seed, result, swarm.summary())
@@ -0,0 +1,106 @@
+""" Testing the batched simple agent kernel against the SimpleAgent """
+import logging
+import random
+import numpy as np
+
+from swarm.agents import SimpleAgent
+from swarm.agents import simple_kernel
+
+
+class CandidateWorld(object):
+
+    """ A world with a given set of candidates around node 0 """
+
+    def __init__(self, alpha, explorated, cost):
+        self._candidates = list(range(1, len(alpha) + 1))
+        self._alpha = dict(zip(self._candidates, alpha))
+        self._explorated = dict(zip(self._candidates, explorated))
+        self._cost = dict(zip(self._candidates, cost))
+
+    def connected(self, node):
+        return list(self._candidates)
+
+    def explorated(self, node):
+        return self._explorated[node]
+
+    def cost(self, node_1, node_2):
+        return self._cost[node_2]
+
+    def get_agents_numbers(self, node):
+        return self._alpha[node]
+
+
+def agent_record(alpha, explorated, cost, taus):
+    """ Move a SimpleAgent and get its record of the candidates """
+    conf = {"record": True, "continously": False,
+            "tau_1": taus[0], "tau_2": taus[1], "tau_3": taus[2]}
+    agent = SimpleAgent(conf, 0, seed=0)
+    agent.move(CandidateWorld(alpha, explorated, cost), [])
+
+    return agent.pop_records()[0]
+
+
+def random_candidates(rnd, size, equal_cost=False):
+    """ Create a random candidate set """
+    alpha = [rnd.choice((0, 0, 1, 2, 3)) for _ in range(size)]
+    explorated = [rnd.random() < 0.5 for _ in range(size)]
+    if equal_cost:
+        cost = [rnd.randint(1, 10)] * size
+    else:
+        cost = [rnd.randint(1, 10) for _ in range(size)]
+
+    return alpha, explorated, cost
+
+
+def check(candidates, taus):
+    """ Compare the kernel with the records of the agents """
+    records = [agent_record(*c, t) for c, t in zip(candidates, taus)]
+
+    sizes = [len(c[0]) for c in candidates]
+    offsets = np.concatenate(([0], np.cumsum(sizes)))
+    alpha = np.concatenate([c[0] for c in candidates])
+    explorated = np.concatenate([c[1] for c in candidates]).astype(bool)
+    cost = np.concatenate([c[2] for c in candidates])
+    taus = np.array(taus, dtype=np.float64).T
+
+    expected = {
+        "agent_likelihood": simple_kernel.agent_likelihood(offsets, alpha),
+        "exploration_likelihood": simple_kernel.exploration_likelihood(offsets, alpha, explorated),
+        "cost_likelihood": simple_kernel.cost_likelihood(offsets, cost),
+        "likelihood": simple_kernel.likelihood(offsets, alpha, explorated, cost, *taus),
+    }
+
+    for key, values in expected.items():
+        recorded = np.concatenate([r[key] for r in records])
+        assert np.allclose(values, recorded), f"The kernel {key} differs from the SimpleAgent"
+
+
+def main():
+    """ Main test function """
+    logging.root.setLevel(logging.ERROR)
+    rnd = random.Random(0)
+
+    # Random candidate sets and taus
+    for _ in range(50):
+        agents = rnd.randint(1, 20)
+        candidates = [random_candidates(rnd, rnd.randint(1, 6)) for _ in range(agents)]
+        taus = [(rnd.random(), rnd.random(), rnd.random()) for _ in range(agents)]
+        check(candidates, taus)
+
+    # All the taus is zero, every candidate is equally unlikely
+    candidates = [random_candidates(rnd, rnd.randint(1, 6)) for _ in range(20)]
+    check(candidates, [(0, 0, 0)] * 20)
+
+    offsets = np.concatenate(([0], np.cumsum([len(c[0]) for c in candidates])))
+    weights = np.zeros(offsets[-1])
+    selected = simple_kernel.weighted_choice(offsets, weights, np.random.default_rng(0))
+    assert np.all((offsets[:-1] <= selected) & (selected < offsets[1:])), \
+        "The kernel does not select uniformly between the candidates of an agent"
+
+    # The same cost to every candidate
+    candidates = [random_candidates(rnd, rnd.randint(1, 6), equal_cost=True) for _ in range(20)]
+    check(candidates, [(rnd.random(), rnd.random(), rnd.random()) for _ in range(20)])
+
+
+if __name__ == "__main__":
+    main()
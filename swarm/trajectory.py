@@ -0,0 +1,428 @@
+""" Binary trajectory files of the agents
+
+    A trajectory holds the position of every agent in each turn as a
+    turns x agents int32 matrix, and the records of the agents (see
+    SimpleAgent.move) as a structured array with an element per candidate
+    node. The records of agent a in turn t is the elements
+    offsets[t, a] to offsets[t, a + 1] (the offsets is a turns x (agents + 1)
+    matrix, a turn without a record has no elements).
+
+    It is stored as an uncompressed npz file, together with the summary of
+    the simulation (seed, nodes, turns and discovered). A TrajectoryWriter
+    writes the file turn by turn during the simulation.
+"""
+from typing import Dict, List, Tuple
+import os
+import shutil
+import zipfile
+import numpy as np
+
+
+# The fields of a record, there is a value for each candidate node
+RECORD_DTYPE = np.dtype([
+    ("alpha", np.int32),
+    ("explorated", np.bool_),
+    ("cost", np.float64),
+    ("likelihood", np.float64),
+    ("agent_likelihood", np.float64),
+    ("exploration_likelihood", np.float64),
+    ("cost_likelihood", np.float64),
+])
+
+# The summary of the simulation stored in the file
+SUMMARY_KEYS = ("seed", "nodes", "turns")
+
+# The position of an agent without history in a turn
+NO_POSITION = -1
+
+
+class Trajectory(object):
+
+    """ The positions and records of the agents in each turn """
+
+    def __init__(self, positions: np.ndarray, offsets: np.ndarray = None,
+                 records: np.ndarray = None, summary: Dict = None):
+        """ Create the trajectory
+
+        :positions: The position of each agent in each turn (turns x agents)
+        :offsets: The start of the records of each agent in each turn
+                  (turns x (agents + 1), None for no records)
+        :records: The records (RECORD_DTYPE)
+        :summary: The seed, nodes, turns and discovered of the simulation
+
+        """
+        self._positions = np.asarray(positions, dtype=np.int32)
+        if self._positions.ndim != 2:
+            self._positions = self._positions.reshape(len(self._positions), -1)
+
+        turns, agents = self._positions.shape
+        if offsets is None:
+            offsets = np.zeros((turns, agents + 1), dtype=np.int64)
+            records = np.zeros(0, dtype=RECORD_DTYPE)
+
+        self._offsets = np.asarray(offsets, dtype=np.int64)
+        self._records = records
+        self._summary = dict(summary or {})
+
+    @classmethod
+    def from_agents(cls, agents: List, summary: Dict = None):
+        """ Create the trajectory from the history and records of agents
+
+        :agents: The agents
+        :summary: The seed, nodes, turns and discovered of the simulation
+        :returns: The trajectory
+
+        """
+        return cls.from_lists([a._history for a in agents],
+                              [a._record for a in agents], summary)
+
+    @classmethod
+    def from_lists(cls, histories: List[List[int]], records: List[List[Dict]],
+                   summary: Dict = None):
+        """ Create the trajectory from history and record lists
+
+        :histories: The positions of each agent
+        :records: The records of each agent, a dict of lists for each turn
+        :summary: The seed, nodes, turns and discovered of the simulation
+        :returns: The trajectory
+
+        """
+        agents = len(histories)
+        turns = max([len(h) for h in histories] + [len(r) for r in records] + [0])
+
+        positions = np.full((turns, agents), NO_POSITION, dtype=np.int32)
+        for a, history in enumerate(histories):
+            positions[:len(history), a] = history
+
+        sizes = np.zeros((turns, agents), dtype=np.int64)
+        for a, record in enumerate(records):
+            for t, r in enumerate(record):
+                sizes[t, a] = len(r.get("likelihood", ()))
+
+        # The records is ordered by turn and then by agent
+        ends = np.cumsum(sizes.reshape(-1)).reshape(turns, agents)
+        offsets = np.zeros((turns, agents + 1), dtype=np.int64)
+        offsets[:, :agents] = ends - sizes
+        if agents > 0:
+            offsets[:, agents] = ends[:, -1]
+
+        flat = np.zeros(int(sizes.sum()), dtype=RECORD_DTYPE)
+        for a, record in enumerate(records):
+            for t, r in enumerate(record):
+                flat[offsets[t, a]:offsets[t, a] + sizes[t, a]] = _to_records(r)
+
+        return cls(positions, offsets, flat, summary)
+
+    @classmethod
+    def from_results(cls, results: Dict):
+        """ Convert the results written by the old YAML AgentDataRecorder
+
+        :results: The loaded YAML file
+        :returns: The trajectory
+
+        """
+        summary = {k: results[k] for k in SUMMARY_KEYS + ("discovered",) if k in results}
+        records = results.get("agents_record") or [[] for _ in results["agents_history"]]
+
+        return cls.from_lists(results["agents_history"], records, summary)
+
+    @classmethod
+    def load(cls, filename: str):
+        """ Load a trajectory file
+
+        :filename: The file
+        :returns: The trajectory
+
+        """
+        with np.load(filename) as data:
+            summary = {k: data[k].item() for k in SUMMARY_KEYS if k in data}
+            if "discovered" in data:
+                summary["discovered"] = data["discovered"].tolist()
+
+            return cls(data["positions"], data["offsets"], data["records"], summary)
+
+    def save(self, filename: str) -> None:
+        """ Save the trajectory to a file
+
+        :filename: The file (.npz)
+
+        """
+        summary = {k: np.asarray(self._summary[k]) for k in SUMMARY_KEYS if k in self._summary}
+        if "discovered" in self._summary:
+            summary["discovered"] = np.asarray(self._summary["discovered"], dtype=np.int32)
+
+        with open(filename, "wb") as f:
+            np.savez(f, positions=self._positions, offsets=self._offsets,
+                     records=self._records, **summary)
+
+    @property
+    def positions(self) -> np.ndarray:
+        """ The position of each agent in each turn (turns x agents) """
+        return self._positions
+
+    @property
+    def summary(self) -> Dict:
+        """ The seed, nodes, turns and discovered of the simulation """
+        return self._summary
+
+    @property
+    def turns(self) -> int:
+        """ The number of turns with positions """
+        return self._positions.shape[0]
+
+    @property
+    def agents(self) -> int:
+        """ The number of agents """
+        return self._positions.shape[1]
+
+    def records(self, turn: int, agent: int) -> np.ndarray:
+        """ Get the records of an agent in a turn
+
+        :turn: The turn
+        :agent: The agent
+        :returns: The records of each candidate node (RECORD_DTYPE)
+
+        """
+        if turn >= len(self._offsets):
+            return self._records[:0]
+
+        return self._records[self._offsets[turn, agent]:self._offsets[turn, agent + 1]]
+
+    def record(self, turn: int, agent: int) -> Dict:
+        """ Get the record of an agent in a turn, like SimpleAgent.record
+
+        :turn: The turn
+        :agent: The agent
+        :returns: A list of the values of each field (empty if there is no record)
+
+        """
+        records = self.records(turn, agent)
+        if len(records) == 0:
+            return {}
+
+        return {field: records[field].tolist() for field in RECORD_DTYPE.names}
+
+
+def load_results(filename: str) -> Trajectory:
+    """ Load the trajectory of a result file
+
+        The file is either a trajectory file (.npz), a YAML file written by
+        the AgentDataRecorder which refers to a trajectory file, or a YAML
+        file with the history and records (the old format), which is
+        converted. A trajectory file which was not finished, e.g. after a
+        crash, is recovered from its parts.
+
+    :filename: The result file
+    :returns: The trajectory
+
+    """
+    if filename.endswith(".npz"):
+        if not os.path.exists(filename) and os.path.isdir(_parts(filename)):
+            TrajectoryWriter.recover(filename)
+        return Trajectory.load(filename)
+
+    import yaml
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    with open(filename, "r") as f:
+        results = yaml.load(f, Loader=loader)
+
+    if "trajectory" in results:
+        path = os.path.join(os.path.dirname(filename), results["trajectory"])
+        trajectory = Trajectory.load(path)
+        trajectory.summary.update({k: results[k] for k in SUMMARY_KEYS if k in results})
+        return trajectory
+
+    return Trajectory.from_results(results)
+
+
+class TrajectoryWriter(object):
+
+    """ Writing a trajectory file turn by turn
+
+        The turns is buffered and appended in chunks of a fixed number of
+        turns to raw part files, in a directory beside the file, which is
+        flushed after every chunk. On close the parts is copied into the
+        trajectory file and removed, so only a chunk is kept in memory. The
+        complete turns of the parts left by a crash is packed by recover.
+    """
+
+    def __init__(self, filename: str, agents: int, chunk: int = 256):
+        """ Create the writer
+
+        :filename: The trajectory file (.npz)
+        :agents: The number of agents
+        :chunk: The number of turns buffered between the writes
+
+        """
+        self._filename = filename
+        self._agents = agents
+        self._chunk = chunk
+
+        self._parts = _parts(filename)
+        os.makedirs(self._parts, exist_ok=True)
+        with open(os.path.join(self._parts, "agents"), "w") as f:
+            f.write(str(agents))
+
+        # The records is written first, a turn is complete when its offsets is
+        self._files = {name: open(os.path.join(self._parts, name), "wb")
+                       for name in ("records", "positions", "offsets")}
+
+        self._positions = np.zeros((chunk, agents), dtype=np.int32)
+        self._offsets = np.zeros((chunk, agents + 1), dtype=np.int64)
+        self._records = []
+        self._buffered = 0
+        self._total = 0
+        self._turns = 0
+
+    @property
+    def turns(self) -> int:
+        """ The number of appended turns """
+        return self._turns
+
+    def append(self, positions, records: List[Tuple[int, Dict]] = ()) -> None:
+        """ Append a turn
+
+        :positions: The position of each agent
+        :records: The agent and record of the agents with a record in the
+                  turn (a dict of lists, see SimpleAgent.move), ordered by agent
+
+        """
+        sizes = np.zeros(self._agents, dtype=np.int64)
+        for agent, record in records:
+            converted = _to_records(record)
+            sizes[agent] += len(converted)
+            self._records.append(converted)
+
+        row = self._offsets[self._buffered]
+        row[0] = self._total
+        np.cumsum(sizes, out=row[1:])
+        row[1:] += self._total
+        self._total = int(row[-1])
+
+        self._positions[self._buffered] = positions
+        self._buffered += 1
+        self._turns += 1
+
+        if self._buffered == self._chunk:
+            self.flush()
+
+    def flush(self) -> None:
+        """ Write the buffered turns to the parts """
+        if self._records:
+            self._files["records"].write(np.concatenate(self._records).tobytes())
+        self._files["positions"].write(self._positions[:self._buffered].tobytes())
+        self._files["offsets"].write(self._offsets[:self._buffered].tobytes())
+        for f in self._files.values():
+            f.flush()
+
+        self._records.clear()
+        self._buffered = 0
+
+    def close(self, summary: Dict = None) -> None:
+        """ Write the trajectory file and remove the parts
+
+        :summary: The seed, nodes, turns and discovered of the simulation
+
+        """
+        self.flush()
+        for f in self._files.values():
+            f.close()
+
+        _pack(self._filename, self._parts, self._agents, self._turns,
+              self._total, summary)
+
+    @classmethod
+    def recover(cls, filename: str) -> None:
+        """ Write the trajectory file from the parts left by an interrupted writer
+
+        :filename: The trajectory file (.npz)
+
+        """
+        parts = _parts(filename)
+        with open(os.path.join(parts, "agents"), "r") as f:
+            agents = int(f.read())
+
+        def rows(name, size):
+            return os.path.getsize(os.path.join(parts, name)) // size
+
+        turns = min(rows("positions", agents * 4), rows("offsets", (agents + 1) * 8))
+        total = 0
+        if turns > 0:
+            offsets = np.memmap(os.path.join(parts, "offsets"), dtype=np.int64,
+                                mode="r", shape=(turns, agents + 1))
+            # Only the turns whose records is all in the records part is complete
+            turns = int(np.searchsorted(offsets[:, -1], rows("records", RECORD_DTYPE.itemsize),
+                                        side="right"))
+            total = int(offsets[turns - 1, -1]) if turns > 0 else 0
+            del offsets
+
+        _pack(filename, parts, agents, turns, total)
+
+
+def _parts(filename: str) -> str:
+    """ The directory with the parts of a trajectory file """
+    return filename + ".parts"
+
+
+def _pack(filename: str, parts: str, agents: int, turns: int, records: int,
+          summary: Dict = None) -> None:
+    """ Copy the parts into a trajectory file, like Trajectory.save
+
+    :filename: The trajectory file
+    :parts: The directory with the parts
+    :agents: The number of agents
+    :turns: The number of complete turns in the parts
+    :records: The number of records in the complete turns
+    :summary: The seed, nodes, turns and discovered of the simulation
+
+    """
+    arrays = {
+        "positions": (np.dtype(np.int32), (turns, agents)),
+        "offsets": (np.dtype(np.int64), (turns, agents + 1)),
+        "records": (RECORD_DTYPE, (records,)),
+    }
+
+    summary = summary or {}
+    with zipfile.ZipFile(filename, "w", zipfile.ZIP_STORED, allowZip64=True) as z:
+        for name, (dtype, shape) in arrays.items():
+            size = dtype.itemsize * int(np.prod(shape))
+            with z.open(name + ".npy", "w", force_zip64=True) as out, \
+                    open(os.path.join(parts, name), "rb") as part:
+                np.lib.format.write_array_header_2_0(out, {
+                    "descr": np.lib.format.dtype_to_descr(dtype),
+                    "fortran_order": False,
+                    "shape": shape})
+                _copy(part, out, size)
+
+        for k in SUMMARY_KEYS + ("discovered",):
+            if k in summary:
+                dtype = np.int32 if k == "discovered" else None
+                with z.open(k + ".npy", "w") as out:
+                    np.lib.format.write_array(out, np.asarray(summary[k], dtype=dtype))
+
+    shutil.rmtree(parts)
+
+
+def _copy(source, destination, size: int, block: int = 1 << 20) -> None:
+    """ Copy the first bytes of a file in blocks """
+    while size > 0:
+        data = source.read(min(block, size))
+        if not data:
+            raise EOFError("The part is shorter than its turns")
+        destination.write(data)
+        size -= len(data)
+
+
+def _to_records(record: Dict) -> np.ndarray:
+    """ Convert a record to a structured array
+
+    :record: The record, a list of the values of each field
+    :returns: The records (RECORD_DTYPE)
+
+    """
+    records = np.zeros(len(record.get("likelihood", ())), dtype=RECORD_DTYPE)
+    for field in RECORD_DTYPE.names:
+        if field in record:
+            records[field] = record[field]
+
+    return records
@@ -0,0 +1,218 @@
+""" Struct of arrays swarm engine """
+from typing import Callable as Func, List, Tuple
+import random as rnd
+import numpy as np
+
+from .swarm import SwarmSummary, count_positions
+from .agents import RandomAgent, SimpleAgent, MovementLog
+from .agents import simple_kernel
+
+
+# Type tags of the agents
+PYTHON_AGENT = 0
+RANDOM_AGENT = 1
+SIMPLE_AGENT = 2
+
+
+class VectorSwarm(object):
+
+    """ A swarm holding the agents state in arrays
+
+        The position, traveled distance and type of every agent is stored
+        in NumPy arrays. All the built-in RandomAgent's is moved in a single
+        batched step, and so is SimpleAgent's which neither has continously
+        nor record enabled. Other agents are moved by calling their move
+        function after the batched steps.
+
+        It has the same interface as Swarm, and can be used with the
+        Simulator in its place.
+    """
+
+    def __init__(self, agent_generators: List[Tuple[int, Func]], seed: int = None):
+        """ Create the swarm
+
+        :agent_generators: The amount and generator of each group of agents
+        :seed: The seed for the batched agents (None draws it from the global random module)
+
+        """
+        self._generator = agent_generators
+
+        if seed is None:
+            seed = rnd.getrandbits(64)
+        self._rng = np.random.default_rng(seed)
+
+        self._agents = []
+        self.create_swarm()
+
+    def create_swarm(self) -> None:
+        """ Create the swarm according to the generators
+
+            The generator of each group is called once to find the type of
+            the agents, a batched group starts at the position of that agent.
+        """
+        self._agents.clear()
+
+        types = []
+        positions = []
+        taus = []
+        for amount, gen in self._generator:
+            if amount == 0:
+                continue
+
+            agent = gen()
+            tag = self._type_tag(agent)
+            types.append(np.full(amount, tag, dtype=np.uint8))
+            if tag == SIMPLE_AGENT:
+                taus.append(np.tile([agent._tau_1, agent._tau_2, agent._tau_3], (amount, 1)))
+
+            if tag != PYTHON_AGENT:
+                positions.append(np.full(amount, agent.position, dtype=np.int64))
+                continue
+
+            group = [agent] + [gen() for _ in range(amount - 1)]
+            self._agents.extend(group)
+            positions.append(np.array([a.position for a in group], dtype=np.int64))
+
+        self._types = np.concatenate(types) if types else np.zeros(0, dtype=np.uint8)
+        self._positions = np.concatenate(positions) if positions else np.zeros(0, dtype=np.int64)
+        self._traveled_distance = np.zeros(len(self._positions), dtype=np.float64)
+        self._taus = np.concatenate(taus).T if taus else np.zeros((3, 0))
+
+        self._batched = np.flatnonzero(self._types == RANDOM_AGENT)
+        self._simple = np.flatnonzero(self._types == SIMPLE_AGENT)
+        self._python = np.flatnonzero(self._types == PYTHON_AGENT)
+
+        self._count_positions()
+
+    @staticmethod
+    def _type_tag(agent) -> int:
+        """ Get the type tag of an agent """
+        if type(agent) is RandomAgent:
+            return RANDOM_AGENT
+
+        if type(agent) is SimpleAgent and not agent._conf.get('continously', True) \
+                and not agent._conf.get('record', False):
+            return SIMPLE_AGENT
+
+        return PYTHON_AGENT
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    @property
+    def positions(self) -> np.ndarray:
+        """ The position of every agent """
+        return self._positions
+
+    @property
+    def traveled_distance(self) -> np.ndarray:
+        """ The traveled distance of every agent """
+        return self._traveled_distance
+
+    @property
+    def types(self) -> np.ndarray:
+        """ The type tag of every agent """
+        return self._types
+
+    def move_all(self, world):
+        """ Move all agents in the swarm
+
+        :world: The world
+        :returns: The amount of new explorated nodes
+
+        """
+        batched = self._batched
+        old = self._positions[batched]
+        new, cost = world.random_neighbors(old, self._rng)
+        self._positions[batched] = new
+        self._traveled_distance[batched] += cost
+        moved = [(old, new)]
+
+        if len(self._simple) != 0:
+            moved.append(self._move_simple(world))
+
+        if len(self._python) != 0:
+            agent_movement = MovementLog(world)
+            for old, new in moved:
+                agent_movement.extend_many(old, new)
+            for i, agent in zip(self._python.tolist(), self._agents):
+                old_pos = agent.position
+                pos = agent.move(world, agent_movement)
+                agent_movement.append([old_pos, pos])
+                self._positions[i] = pos
+                self._traveled_distance[i] = agent.traveled_distance
+
+        self._count_positions()
+
+        return world.explore_many(self._nodes)
+
+    def _move_simple(self, world):
+        """ Move all the batched simple agents
+
+        :world: The world
+        :returns: The old and new positions of the agents
+
+        """
+        simple = self._simple
+        old = self._positions[simple]
+
+        offsets, candidates, cost = world.gather(old)
+        likelihood = simple_kernel.likelihood(offsets,
+                                              world.get_agents_many(candidates),
+                                              world.explorated_many(candidates),
+                                              cost, *self._taus)
+        selected = simple_kernel.weighted_choice(offsets, likelihood, self._rng)
+
+        new = candidates[selected]
+        self._positions[simple] = new
+        self._traveled_distance[simple] += cost[selected]
+
+        return old, new
+
+    def set_positions(self, position: int) -> None:
+        """ Set the same position for all agents in swarm
+
+        :position: The node id
+
+        """
+        for agent in self._agents:
+            agent.position = position
+
+        self._positions[:] = position
+        self._count_positions()
+
+    def get_positions(self) -> Tuple[np.ndarray, np.ndarray]:
+        """ Get the position of the swarm
+        :returns: The position and the number of agent in different positions
+
+        """
+        return self._nodes, self._counts
+
+    def pop_records(self) -> List[Tuple[int, dict]]:
+        """ Get the records of the agents since the last call and forget them
+
+            Only the agents moved by their move function has records.
+
+        :returns: The index and record of each record, ordered by agent
+
+        """
+        return [(int(i), r) for i, agent in zip(self._python, self._agents)
+                for r in agent.pop_records()]
+
+    def summary(self) -> SwarmSummary:
+        """ Get the summary of the swarm
+
+        :returns: The summary
+
+        """
+        traveling_distance = self._traveled_distance
+
+        return SwarmSummary(traveling_distance.tolist(),
+                            float(traveling_distance.min()),
+                            float(traveling_distance.mean()),
+                            float(traveling_distance.std(ddof=1)),
+                            float(traveling_distance.max()))
+
+    def _count_positions(self) -> None:
+        """ Count the number of agents at each occupied node """
+        self._nodes, self._counts = count_positions(self._positions)
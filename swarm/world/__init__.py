@@ -1,3 +1,6 @@
 from .world import World
 from .generate import WorldGenerator
 from .color import NoColor, ClassicColor
+from .csr import CSRGraph
+from .cache import DistanceCache
+from .closure import MetricClosure
@@ -0,0 +1,151 @@
+""" On-disk cache of the shortest path matrices of worlds """
+from typing import Optional
+import numpy as np
+import logging
+import os
+
+from .csr import CSRGraph
+
+
+class DistanceCache(object):
+
+    """ A directory of distance and predecessor matrices
+
+        The matrices are stored as .npy files named after the content hash
+        of the navigation map and the kind of matrix, and are opened memory
+        mapped so parallel workers share the pages instead of recomputing
+        the matrices. The distance and predecessor matrix of a world is
+        stored separately, as the predecessors is only calculated when a
+        path is needed.
+
+        The size of the directory is limited, when it grows above the limit
+        the least recently used entries are removed.
+
+        The cache is only an optimisation, a directory which can not be
+        written (e.g. read only or a full disk) is logged and the matrices
+        is used without caching them.
+    """
+
+    DISTANCES = "distances"
+    PREDECESSORS = "predecessors"
+
+    def __init__(self, directory: str, max_size: int = 1 << 30):
+        """ Create the cache
+
+        :directory: The cache directory, it is created if missing
+        :max_size: The maximum size of the cache in bytes
+
+        """
+        assert max_size > 0, "The size of the cache must be a positive number"
+
+        self._directory = directory
+        self._max_size = max_size
+        try:
+            os.makedirs(directory, exist_ok=True)
+        except OSError as e:
+            logging.warning(f"Could not create the distance cache {directory}: {e}")
+
+    @staticmethod
+    def key(graph: CSRGraph) -> str:
+        """ Get the cache key of a graph
+
+        :graph: The navigation map
+        :returns: The key
+
+        """
+        return graph.digest()
+
+    def load(self, key: str, kind: str = DISTANCES) -> Optional[np.ndarray]:
+        """ Load a matrix of a world
+
+        :key: The cache key
+        :kind: The matrix, DISTANCES or PREDECESSORS
+        :returns: The memory mapped matrix or None if not cached
+
+        """
+        filename = self._filename(key, kind)
+
+        try:
+            matrix = np.load(filename, mmap_mode="r")
+        except (OSError, ValueError):
+            # Missing, removed by an other process while loading or not readable
+            return None
+
+        try:
+            # Mark the entry as recently used
+            os.utime(filename)
+        except OSError:
+            # It is only used to select the entries to evict
+            pass
+
+        logging.debug(f"Loaded {kind} matrix {key} from cache")
+
+        return matrix
+
+    def store(self, key: str, kind: str, matrix: np.ndarray) -> None:
+        """ Store a matrix of a world
+
+        :key: The cache key
+        :kind: The matrix, DISTANCES or PREDECESSORS
+        :matrix: The matrix
+
+        """
+        try:
+            # The file is replaced atomically, so load() only sees complete matrices
+            self._write(self._filename(key, kind), matrix)
+
+            logging.debug(f"Stored {kind} matrix {key} in cache")
+
+            self.evict()
+        except OSError as e:
+            logging.warning(f"Could not store the {kind} matrix {key} in the cache: {e}")
+
+    def evict(self) -> None:
+        """ Remove the least recently used entries until the cache is below the size limit """
+        entries = {}
+        for name in os.listdir(self._directory):
+            if not name.endswith(".npy"):
+                continue
+
+            path = os.path.join(self._directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+
+            key = name.split("_")[0]
+            size, used, paths = entries.get(key, (0, 0, []))
+            entries[key] = (size + stat.st_size, max(used, stat.st_mtime), paths + [path])
+
+        total = sum(size for size, _, _ in entries.values())
+
+        for key, (size, _, paths) in sorted(entries.items(), key=lambda e: e[1][1]):
+            if total <= self._max_size:
+                break
+
+            logging.debug(f"Evicting distance matrices {key} from cache")
+            for path in paths:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+            total -= size
+
+    def _filename(self, key: str, kind: str) -> str:
+        """ Get the filename of a matrix """
+        return os.path.join(self._directory, f"{key}_{kind}.npy")
+
+    def _write(self, filename: str, array: np.ndarray) -> None:
+        """ Write an array atomically, so concurrent readers never see a partial file """
+        temp = f"{filename}.{os.getpid()}.tmp"
+        try:
+            with open(temp, "wb") as f:
+                np.save(f, array)
+
+            os.replace(temp, filename)
+        except OSError:
+            # Do not leave a partial file, e.g. when the disk is full
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
@@ -0,0 +1,107 @@
+""" Virtual fully connected view of the world """
+from typing import Callable
+import numpy as np
+
+
+class MetricClosure(object):
+
+    """ The metric closure of a graph
+
+        Every pair of nodes is connected, and the cost between them is the
+        cost of the shortest path in the original graph. No edges are
+        materialized, all queries is served from the distance matrix, which
+        is first requested when it is needed.
+
+    """
+
+    def __init__(self, distances: Callable[[], np.ndarray], nodes: int):
+        """ Create the view
+
+        :distances: Function returning the n x n distance matrix
+        :nodes: The number of nodes
+
+        """
+        self._get_distances = distances
+        self._distances = None
+        self._n = nodes
+        self._nodes = np.arange(nodes, dtype=np.int32)
+        self._nodes.setflags(write=False)
+
+    @property
+    def distances(self) -> np.ndarray:
+        """ The distance matrix """
+        if self._distances is None:
+            self._distances = self._get_distances()
+
+        return self._distances
+
+    def number_of_nodes(self) -> int:
+        """ Get the number of nodes """
+        return self._n
+
+    def neighbors(self, node: int) -> np.ndarray:
+        """ Get the neighbors of a node (all other nodes)
+
+        :node: The node id
+        :returns: The neighbors
+
+        """
+        return np.concatenate((self._nodes[:node], self._nodes[node + 1:]))
+
+    def gather(self, nodes: np.ndarray):
+        """ Get the neighbors (all other nodes) of many nodes as flat arrays
+
+        :nodes: The node ids
+        :returns: The offsets, where the neighbors of nodes[k] is stored in
+                  [offsets[k]:offsets[k + 1]], the neighbors and the costs
+
+        """
+        k = len(nodes)
+        offsets = np.arange(k + 1, dtype=np.int64) * (self._n - 1)
+        others = np.tile(np.arange(self._n - 1), k).reshape(k, self._n - 1)
+        others += others >= np.asarray(nodes)[:, None]
+        sources = np.repeat(nodes, self._n - 1)
+        others = others.ravel()
+
+        return offsets, others, self.distances[sources, others]
+
+    def random_neighbors(self, nodes: np.ndarray, rng: np.random.Generator):
+        """ Select a uniformly random other node for each node
+
+        :nodes: The node ids
+        :rng: The random generator
+        :returns: The selected nodes and the cost to them
+
+        """
+        other = rng.integers(0, self._n - 1, size=len(nodes))
+        other += other >= nodes
+
+        return other, self.distances[nodes, other]
+
+    def cost(self, node_1: int, node_2: int) -> float:
+        """ Get the cost between two nodes
+
+        :node_1: Node id
+        :node_2: Node id
+        :returns: The cost
+        :raises KeyError: If the nodes are the same or not connected
+
+        """
+        cost = self.distances[node_1, node_2]
+        if node_1 == node_2 or not np.isfinite(cost):
+            raise KeyError(f"No edge between {node_1} and {node_2}")
+
+        return float(cost)
+
+    def path_cost(self, path) -> float:
+        """ Get the total cost along a path
+
+        :path: The nodes along the path
+        :returns: The summed cost
+
+        """
+        path = np.asarray(path, dtype=np.int64)
+        if len(path) < 2:
+            return 0
+
+        return float(np.sum(self.distances[path[:-1], path[1:]], dtype=np.float64))
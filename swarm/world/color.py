@@ -1,8 +1,9 @@
 """" WORLD COLOR ACCORDING TO MENNING """
 
-UNEXPLORATED = "2"
-EXPLORATED = "3"
-START = "1"
+# The node states, stored as uint8 in the world
+UNEXPLORATED = 2
+EXPLORATED = 3
+START = 1
 
 class Colormap(object):
 
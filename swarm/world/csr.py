@@ -0,0 +1,205 @@
+""" Compact adjacency representation of the world """
+import hashlib
+import networkx as nx
+import numpy as np
+
+
+class CSRGraph(object):
+
+    """ An immutable compressed sparse row (CSR) snapshot of a weighted graph
+
+        The neighbors of node i is stored in indices[indptr[i]:indptr[i + 1]]
+        sorted by node id, and the weight of the edge to each neighbor is
+        stored at the same position in weights.
+
+    """
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray,
+                 weights: np.ndarray):
+        """ Create the graph
+
+        :indptr: The row pointers (int32) of length nodes + 1
+        :indices: The column indices (int32)
+        :weights: The weight of each edge (float32)
+
+        """
+        assert len(indptr) >= 1, "The row pointers must contain at least one element"
+        assert len(indices) == len(weights), "There must be a weight for each edge"
+
+        self._indptr = np.ascontiguousarray(indptr, dtype=np.int32)
+        self._indices = np.ascontiguousarray(indices, dtype=np.int32)
+        self._weights = np.ascontiguousarray(weights, dtype=np.float32)
+        self._n = len(self._indptr) - 1
+
+        # Global edge keys (row * n + column) are strictly increasing, as
+        # the rows are stored in order and each row is sorted. This allows
+        # an edge lookup with a single binary search.
+        rows = np.repeat(np.arange(self._n, dtype=np.int64),
+                         np.diff(self._indptr))
+        self._keys = rows * self._n + self._indices
+
+        for a in (self._indptr, self._indices, self._weights, self._keys):
+            a.setflags(write=False)
+
+    def __reduce__(self):
+        """ Pickle only the CSR arrays, the edge keys are rebuilt on load """
+        return (self.__class__, (self._indptr, self._indices, self._weights))
+
+    @classmethod
+    def from_networkx(cls, graph: nx.Graph, weight: str = "weight"):
+        """ Create a snapshot of a networkx graph
+
+        :graph: The graph, the nodes must be labeled 0 to n - 1
+        :weight: The edge attribute containing the weight
+        :returns: The snapshot
+
+        """
+        n = graph.number_of_nodes()
+        edges = np.array(list(graph.edges(data=weight, default=1)),
+                         dtype=np.float64).reshape(-1, 3)
+        u = edges[:, 0].astype(np.int32)
+        v = edges[:, 1].astype(np.int32)
+
+        # Every undirected edge is stored in both rows (self loops only once)
+        loop = u == v
+        rows = np.concatenate((u, v[~loop]))
+        columns = np.concatenate((v, u[~loop]))
+        weights = np.concatenate((edges[:, 2], edges[~loop, 2]))
+
+        order = np.lexsort((columns, rows))
+        indptr = np.zeros(n + 1, dtype=np.int32)
+        np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+
+        return cls(indptr, columns[order], weights[order])
+
+    @property
+    def indptr(self) -> np.ndarray:
+        """ The row pointers """
+        return self._indptr
+
+    @property
+    def indices(self) -> np.ndarray:
+        """ The column indices """
+        return self._indices
+
+    @property
+    def weights(self) -> np.ndarray:
+        """ The edge weights """
+        return self._weights
+
+    def number_of_nodes(self) -> int:
+        """ Get the number of nodes """
+        return self._n
+
+    def number_of_edges(self) -> int:
+        """ Get the number of directed edges (an undirected edge counts twice) """
+        return len(self._indices)
+
+    def degree(self) -> np.ndarray:
+        """ Get the degree of all nodes """
+        return np.diff(self._indptr)
+
+    def edges(self):
+        """ Get every undirected edge once
+
+        :returns: The start nodes, end nodes and weights of the edges
+
+        """
+        rows = np.repeat(np.arange(self._n, dtype=np.int32), self.degree())
+        upper = rows <= self._indices
+
+        return rows[upper], self._indices[upper], self._weights[upper]
+
+    def digest(self) -> str:
+        """ Get a content hash of the graph
+
+        :returns: The hex digest
+
+        """
+        h = hashlib.sha256()
+        for a in (self._indptr, self._indices, self._weights):
+            h.update(a.tobytes())
+
+        return h.hexdigest()
+
+    def neighbors(self, node: int) -> np.ndarray:
+        """ Get the neighbors of a node
+
+        :node: The node id
+        :returns: A read only view of the neighbors
+
+        """
+        return self._indices[self._indptr[node]:self._indptr[node + 1]]
+
+    def gather(self, nodes: np.ndarray):
+        """ Get the neighbors of many nodes as flat arrays
+
+        :nodes: The node ids
+        :returns: The offsets, where the neighbors of nodes[k] is stored in
+                  [offsets[k]:offsets[k + 1]], the neighbors and the weights
+
+        """
+        start = self._indptr[nodes]
+        degree = self._indptr[nodes + 1] - start
+        offsets = np.zeros(len(nodes) + 1, dtype=np.int64)
+        np.cumsum(degree, out=offsets[1:])
+
+        edge = np.arange(offsets[-1]) + np.repeat(start - offsets[:-1], degree)
+
+        return offsets, self._indices[edge], self._weights[edge]
+
+    def random_neighbors(self, nodes: np.ndarray, rng: np.random.Generator):
+        """ Select a uniformly random neighbor for each node
+
+        :nodes: The node ids (every node must have a neighbor)
+        :rng: The random generator
+        :returns: The selected neighbors and the weight of the edges to them
+
+        """
+        start = self._indptr[nodes]
+        degree = self._indptr[nodes + 1] - start
+        edge = start + (rng.random(len(nodes)) * degree).astype(np.int64)
+
+        return self._indices[edge], self._weights[edge]
+
+    def edge_index(self, node_1, node_2):
+        """ Get the position of edges in indices and weights
+
+        :node_1: Node id or array of node ids
+        :node_2: Node id or array of node ids
+        :returns: The position of each edge
+        :raises KeyError: If one of the edges does not exist
+
+        """
+        key = np.asarray(node_1, dtype=np.int64) * self._n + node_2
+        index = np.searchsorted(self._keys, key)
+
+        valid = index < len(self._keys)
+        if not np.all(valid) or not np.all(self._keys[index] == key):
+            raise KeyError(f"No edge between {node_1} and {node_2}")
+
+        return index
+
+    def cost(self, node_1: int, node_2: int) -> float:
+        """ Get the weight of a single edge
+
+        :node_1: Node id
+        :node_2: Node id
+        :returns: The weight
+
+        """
+        return float(self._weights[self.edge_index(node_1, node_2)])
+
+    def path_cost(self, path) -> float:
+        """ Get the total weight along a path
+
+        :path: The nodes along the path
+        :returns: The summed weight
+
+        """
+        path = np.asarray(path, dtype=np.int64)
+        if len(path) < 2:
+            return 0
+
+        index = self.edge_index(path[:-1], path[1:])
+        return float(np.sum(self._weights[index], dtype=np.float64))
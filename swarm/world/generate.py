@@ -1,10 +1,12 @@
 """ Generate a world """
-from typing import Tuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Tuple
 import networkx as nx
 import random as rnd
 import logging
 
 from .world import World
+from .csr import CSRGraph
 from .color import START
 
 
@@ -14,13 +16,13 @@ class WorldGenerator(object):
 
     def __init__(self, nodes: Tuple[int, int],
                  edge_multiplier: float, weight_range: Tuple[int, int],
-                 seed=rnd.seed()):
+                 seed=None):
         """ Create a generator
 
         :nodes: The range of the possible nodes
         :edge_multiplier: The maximum number of edges is calculated by nodes * edge_multiplier
         :weight_range: The range of the weight for the edges
-        :seed: The seed for the random generator
+        :seed: The seed for the random generator (None for a random seed)
 
         """
         assert nodes[0] > 0, "The mini number of nodes must be a positive integer"
@@ -39,7 +41,42 @@ class WorldGenerator(object):
         """ Reset the generator to begining
 
         """
-        rnd.seed(self._seed)
+        self._rnd = rnd.Random(self._seed)
+
+    def seeds(self, count: int) -> List[int]:
+        """ Derive a seed for each world in a batch from the seed of the generator
+
+        :count: The number of worlds
+        :returns: The seeds
+
+        """
+        master = rnd.Random(self._seed)
+        return [master.randrange(2**32) for _ in range(count)]
+
+    def generate_many(self, count: int, workers: int = 1) -> List[CSRGraph]:
+        """ Generate a batch of worlds in a process pool
+
+            Each world is generated from its own seed (see seeds), so the
+            result is the same for any number of workers. The worlds are
+            returned as CSR graphs, use World.from_csr to create a world.
+
+        :count: The number of worlds
+        :workers: The number of processes
+        :returns: The navigation maps of the worlds
+
+        """
+        assert workers > 0, "The number of workers must be a positive integer"
+
+        tasks = [((self._min_node, self._max_node), self._edge_multiplier,
+                  (self._min_weight, self._max_weight), seed)
+                 for seed in self.seeds(count)]
+
+        if workers == 1:
+            return [_generate_csr(task) for task in tasks]
+
+        chunksize = max(1, count // (4 * workers))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(_generate_csr, tasks, chunksize=chunksize))
 
     def generate(self) -> World:
         """ Generate a world
@@ -48,53 +85,57 @@ class WorldGenerator(object):
         """
         logging.info("Generating world")
 
-        nodes = rnd.randrange(self._min_node, self._max_node)
-        edge_count = rnd.randint(nodes, int(nodes * self._edge_multiplier))
-        seed = rnd.randint(0, 10000000000)
+        nodes = self._rnd.randrange(self._min_node, self._max_node)
+        edge_count = self._rnd.randint(nodes, int(nodes * self._edge_multiplier))
+        seed = self._rnd.randint(0, 10000000000)
 
         logging.info(f'''World generator settings: Seed: {self._seed} Number nodes: {nodes} Edge count: {edge_count} Weight seed: {seed} ''')
 
         logging.info("Generating complete world")
-        world: nx.Graph = nx.gnm_random_graph(nodes, edge_count)
+        world: nx.Graph = nx.gnm_random_graph(nodes, edge_count, seed=self._rnd)
 
 
         logging.info("Connecting unconnected nodes")
         for i in nx.isolates(world):
             selected = i
             while True:
-                selected = rnd.randint(0, nodes-1)
-                if selected != i and len(list(nx.neighbors(world, selected))) != 0:
+                selected = self._rnd.randint(0, nodes-1)
+                if selected != i and world.degree(selected) != 0:
                     world.add_edge(i, selected)
                     break
 
         logging.info("Removing smale clusters")
 
-        for i in nx.nodes(world):
-            if i == 0:
-                continue
-
-            path = list(nx.algorithms.simple_paths.all_simple_paths(world, 0, i))
-            if len(path) == 0:
-                neigh = list(nx.neighbors(world, i))
-                while True:
-                    selected = rnd.randint(0, nodes-1)
-                    if selected != i and selected not in neigh:
-                        world.add_edge(i, selected)
-                        break
+        # Link the smallest node of every cluster to a random node in the
+        # main cluster (the one containing node 0), linear in nodes + edges
+        components = nx.connected_components(world)
+        main = sorted(next(components))
+        for component in list(components):
+            component = sorted(component)
+            world.add_edge(component[0], self._rnd.choice(main))
+            main.extend(component)
 
         world.nodes[0]['color'] = START
         logging.info("Adding randoms weights to edges")
 
-        state = rnd.getstate()
-        rnd.seed(seed)
+        weight_rnd = rnd.Random(seed)
         labels = {}
         for edge in nx.edges(world):
             i, j = edge
-            weight = rnd.randint(self._min_weight, self._max_weight)
+            weight = weight_rnd.randint(self._min_weight, self._max_weight)
             world[i][j]["weight"] = weight
             labels[edge] = weight
 
-        rnd.setstate(state)
         logging.info("World generated")
 
         return World(world, labels)
+
+
+def _generate_csr(settings) -> CSRGraph:
+    """ Generate a single world in a worker process
+
+    :settings: The arguments to the WorldGenerator
+    :returns: The navigation map of the world
+
+    """
+    return WorldGenerator(*settings).generate().navigation_csr
@@ -0,0 +1,75 @@
+""" Shortest paths between all nodes in the world """
+from typing import Tuple
+import numpy as np
+
+from .csr import CSRGraph
+
+
+NO_PREDECESSOR = -1
+
+# The number of sources solved at once, limiting the float64 temporaries of
+# scipy to BLOCK x n
+BLOCK = 256
+
+
+def all_pairs_shortest_paths(graph: CSRGraph, predecessors: bool = True,
+                             block: int = BLOCK) -> Tuple[np.ndarray, np.ndarray]:
+    """ Calculate the shortest path between all pair of nodes
+
+        The sources is solved in blocks of rows by a sparse Dijkstra, which
+        is written into the result matrices, so only a block is held in
+        double precision.
+
+    :graph: The graph
+    :predecessors: Calculate the predecessor matrix as well
+    :block: The number of sources solved at once
+    :returns: The distance matrix (float32) and the predecessor matrix (int32,
+              None if not calculated), the predecessor of a source or an
+              unreachable node is NO_PREDECESSOR
+
+    """
+    # scipy is only imported when needed, as it is slow to import
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import dijkstra
+
+    n = graph.number_of_nodes()
+    matrix = csr_matrix((graph.weights.astype(np.float64), graph.indices,
+                         graph.indptr), shape=(n, n))
+
+    distances = np.empty((n, n), dtype=np.float32)
+    paths = np.empty((n, n), dtype=np.int32) if predecessors else None
+    for start in range(0, n, block):
+        sources = np.arange(start, min(start + block, n))
+        result = dijkstra(matrix, directed=False, indices=sources,
+                          return_predecessors=predecessors)
+
+        if predecessors:
+            result, previous = result
+            previous[previous < 0] = NO_PREDECESSOR
+            paths[sources] = previous
+        distances[sources] = result
+
+    return distances, paths
+
+
+def reconstruct_path(predecessors: np.ndarray, source: int, target: int) -> list:
+    """ Rebuild the shortest path from the predecessor matrix
+
+    :predecessors: The predecessor matrix
+    :source: The start node
+    :target: The end node
+    :returns: The nodes along the path (source and target included)
+    :raises ValueError: If there is no path between the nodes
+
+    """
+    row = predecessors[source]
+    path = [int(target)]
+    node = target
+    while node != source:
+        node = int(row[node])
+        if node == NO_PREDECESSOR:
+            raise ValueError(f"There is no path between {source} and {target}")
+        path.append(node)
+
+    path.reverse()
+    return path
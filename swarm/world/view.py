@@ -0,0 +1,161 @@
+""" Persistent drawing of the world
+
+    matplotlib is imported by this module, it is only imported when the world
+    is drawn.
+"""
+import weakref
+import networkx as nx
+import numpy as np
+from matplotlib.colors import to_rgba
+
+
+# The view drawn in each figure, a figure shows at most one view
+_views = weakref.WeakKeyDictionary()
+
+
+class WorldView(object):
+
+    """ A drawing of the world which is updated in place
+
+        The edges and edge labels never change, they are drawn once into a
+        background. The nodes, node labels and title are animated artists, on
+        every update only their changed properties is set and they are drawn
+        on top of the saved background (blitting). A full redraw, e.g. when
+        the window is resized, saves a new background.
+
+        A figure has at most one view, creating a view closes the previous
+        view of the figure (e.g. of another world).
+    """
+
+    def __init__(self, fig, graph: nx.Graph, pos: dict, edge_labels: dict,
+                 map_type: str):
+        """ Draw the static part of the world
+
+        :fig: The matplotlib figure
+        :graph: The graph to draw
+        :pos: The position of each node
+        :edge_labels: The labels of the edges
+        :map_type: The type of the map which is drawn
+
+        """
+        previous = _views.get(fig)
+        if previous is not None:
+            previous.close()
+        _views[fig] = self
+
+        fig.clf()
+        self._fig = fig
+        self._ax = fig.gca()
+        self._map_type = map_type
+
+        nodes = range(graph.number_of_nodes())
+        nx.draw_networkx_edges(graph, pos=pos, ax=self._ax)
+        nx.draw_networkx_edge_labels(graph, pos=pos, edge_labels=edge_labels,
+                                     ax=self._ax)
+
+        self._nodes = nx.draw_networkx_nodes(graph, pos=pos, nodelist=nodes,
+                                             ax=self._ax)
+        texts = nx.draw_networkx_labels(graph, pos=pos, ax=self._ax)
+        self._texts = [texts[n] for n in nodes]
+        self._title = self._ax.set_title("")
+        self._ax.set_axis_off()
+
+        self._labels = None
+        self._color_map = None
+        self._lut = None
+        self._background = None
+        for artist in self._animated():
+            artist.set_animated(True)
+
+        self._callback = fig.canvas.mpl_connect("draw_event", self._on_draw)
+
+    def valid(self, fig, map_type: str) -> bool:
+        """ Check if the view can still be used
+
+        :fig: The current figure
+        :map_type: The type of map to draw
+        :returns: False if the figure, the map type changed or the figure was cleared
+
+        """
+        return (fig is self._fig and map_type == self._map_type and
+                self._ax in fig.axes)
+
+    def update(self, state: np.ndarray, labels: np.ndarray, color_map,
+               title: str = None) -> None:
+        """ Update the drawing with the state of the world
+
+        :state: The state of each node
+        :labels: The label of each node
+        :color_map: Converts a state to a color
+        :title: The title (None to keep it)
+
+        """
+        self._nodes.set_facecolor(self._colors(state, color_map))
+
+        # Only the labels which changed is set
+        if self._labels is None:
+            changed = range(len(labels))
+        else:
+            changed = np.flatnonzero(labels != self._labels).tolist()
+        for n in changed:
+            self._texts[n].set_text(str(labels[n]))
+        self._labels = labels.copy()
+
+        if title is not None:
+            self._title.set_text(title)
+
+        canvas = self._fig.canvas
+        if self._background is None:
+            # The full draw saves the background and draws the animated artists
+            canvas.draw()
+            return
+
+        canvas.restore_region(self._background)
+        self._draw_animated()
+        canvas.blit(self._fig.bbox)
+
+    def close(self) -> None:
+        """ Stop updating the background of the figure """
+        self._fig.canvas.mpl_disconnect(self._callback)
+        if _views.get(self._fig) is self:
+            del _views[self._fig]
+
+    def _colors(self, state: np.ndarray, color_map) -> np.ndarray:
+        """ The RGBA color of each node, each state is converted once
+
+        :state: The state of each node
+        :color_map: Converts a state to a color
+        :returns: The colors
+
+        """
+        if color_map is not self._color_map:
+            self._color_map = color_map
+            self._lut = np.zeros((256, 4))
+            for s in range(256):
+                color = color_map(s)
+                if color is not None:
+                    self._lut[s] = to_rgba(color)
+
+        return self._lut[state]
+
+    def _animated(self) -> list:
+        """ The artists which is updated every turn """
+        return [self._nodes, self._title] + self._texts
+
+    def _draw_animated(self) -> None:
+        """ Draw the animated artists on the canvas """
+        for artist in self._animated():
+            self._fig.draw_artist(artist)
+
+    def _on_draw(self, event) -> None:
+        """ Save the background after a full draw, and draw the animated artists on it """
+        if event is not None and event.canvas is not self._fig.canvas:
+            return
+
+        if self._ax not in self._fig.axes:
+            # The figure was cleared, the view is no longer drawn
+            self.close()
+            return
+
+        self._background = self._fig.canvas.copy_from_bbox(self._fig.bbox)
+        self._draw_animated()
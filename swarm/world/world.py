@@ -1,8 +1,13 @@
 """ Contains the world description for the swarm """
 import networkx as nx
 from networkx.drawing.nx_agraph import graphviz_layout
+import numpy as np
 import logging
 
+from .csr import CSRGraph
+from .closure import MetricClosure
+from .shortest_path import all_pairs_shortest_paths, reconstruct_path
+from .cache import DistanceCache
 from .color import UNEXPLORATED, EXPLORATED, START, ClassicColor
 
 
@@ -11,7 +16,12 @@ class World(object):
     """ The world representation """
 
     def __init__(self, map: nx.Graph, labels):
-        """TODO: to be defined. """
+        """ Create the world
+
+        :map: The navigation map, the nodes must be labeled 0 to n - 1
+        :labels: The edge labels used when drawing the map
+
+        """
         logging.debug("Initializing the world")
         self._nav_map = map
         self._map = map
@@ -19,11 +29,62 @@ class World(object):
         self._connected_map = None
         self._labels = labels
 
+        # The networkx graphs are only used for drawing and for solving
+        # TSP, all queries during the simulation is served from the CSR or
+        # from the virtual fully connected map
+        self._nav_csr = CSRGraph.from_networkx(map)
+        self._closure = MetricClosure(self.distances, self._nav_csr.number_of_nodes())
+        self._graph = self._nav_csr
+        self._distances = None
+        self._predecessors = None
+        self._distance_cache = None
+
+        # The drawing is only created when the world is viewed
+        self._layouts = {}
+        self._view = None
+
+        # The node state (color) and the number of agents at each node
+        n = self._nav_csr.number_of_nodes()
+        self._state = np.full(n, UNEXPLORATED, dtype=np.uint8)
+        for node, color in map.nodes(data="color"):
+            if color is not None:
+                self._state[node] = color
+        self._initial_state = self._state.copy()
+        self._agents = np.zeros(n, dtype=np.int32)
+        self._explorated_count = int(np.count_nonzero(self._state == EXPLORATED))
+
+    @classmethod
+    def from_csr(cls, graph: CSRGraph, start: int = 0):
+        """ Create a world from a compact CSR graph
+
+        :graph: The navigation map
+        :start: The start node
+        :returns: The world
+
+        """
+        rows, columns, weights = graph.edges()
+        edges = zip(rows.tolist(), columns.tolist(), weights.tolist())
+
+        map = nx.Graph()
+        map.add_nodes_from(range(graph.number_of_nodes()))
+        map.add_weighted_edges_from(edges)
+        map.nodes[start]["color"] = START
+
+        labels = {(i, j): d for i, j, d in map.edges(data="weight")}
+
+        return cls(map, labels)
+
+    @property
+    def navigation_csr(self) -> CSRGraph:
+        """ The CSR snapshot of the navigation map """
+        return self._nav_csr
+
     def reset(self):
-        """ Reset the map """
-        for i in range(len(self._map.nodes)):
-            self.update_value(i, "color", UNEXPLORATED)
-            
+        """ Reset the map to the state it was created with """
+        self._state[:] = self._initial_state
+        self._agents[:] = 0
+        self._explorated_count = int(np.count_nonzero(self._state == EXPLORATED))
+
     def connected(self, node: int) -> list:
         """ Get the corrected nodes to node
 
@@ -31,7 +92,28 @@ class World(object):
         :returns: list of node
 
         """
-        return list(nx.neighbors(self._map, node))
+        return self._graph.neighbors(node).tolist()
+
+    def gather(self, nodes):
+        """ Get the connected nodes of many nodes as flat arrays
+
+        :nodes: Array of node ids
+        :returns: The offsets, where the connected nodes of nodes[k] is
+                  stored in [offsets[k]:offsets[k + 1]], the connected nodes
+                  and the cost of moving to them
+
+        """
+        return self._graph.gather(np.asarray(nodes, dtype=np.int64))
+
+    def random_neighbors(self, nodes, rng):
+        """ Select a uniformly random connected node for each node
+
+        :nodes: Array of node ids
+        :rng: The numpy random generator
+        :returns: The selected nodes and the cost of moving to them
+
+        """
+        return self._graph.random_neighbors(np.asarray(nodes, dtype=np.int64), rng)
 
     def explore(self, node) -> bool:
         """ Set the node as explorated
@@ -40,21 +122,53 @@ class World(object):
         :return: True if it was unexplorated
 
         """
-        node = int(node)
-        assert 0 <= node <= nx.number_of_nodes(self._map), "Marking a non existing node"
-        if self._map.nodes[node].get("color") == START:
-            return False
-        elif self._map.nodes[node].get("color") == EXPLORATED:
+        if self._state[node] != UNEXPLORATED:
             return False
 
-        self._map.nodes[node]["color"] = EXPLORATED
+        self._state[node] = EXPLORATED
+        self._explorated_count += 1
         return True
 
+    def explore_many(self, nodes) -> int:
+        """ Set nodes as explorated
+
+        :nodes: The node ids (may contain duplicates)
+        :returns: The number of nodes which was unexplorated
+
+        """
+        nodes = np.unique(np.asarray(nodes, dtype=np.int64))
+        nodes = nodes[self._state[nodes] == UNEXPLORATED]
+        self._state[nodes] = EXPLORATED
+        self._explorated_count += len(nodes)
+
+        return len(nodes)
+
+    def set_explorated(self, explorated: np.ndarray) -> None:
+        """ Set the explorated nodes, the other nodes get the state the world was created with
+
+        :explorated: If each node is explorated
+
+        """
+        self._state[:] = self._initial_state
+        self._state[explorated & (self._initial_state == UNEXPLORATED)] = EXPLORATED
+        self._explorated_count = int(np.count_nonzero(self._state == EXPLORATED))
+
     def explorated(self, node) -> bool:
         """ Check if a node is explorated """
-        node = int(node)
-        assert 0 <= node <= nx.number_of_nodes(self._map), "Marking a non existing node"
-        return self._map.nodes[node].get("color") == START or self._map.nodes[node].get("color") == EXPLORATED
+        return bool(self._state[node] != UNEXPLORATED)
+
+    def explorated_many(self, nodes) -> np.ndarray:
+        """ Check if nodes are explorated
+
+        :nodes: Array of node ids
+        :returns: Boolean array
+
+        """
+        return self._state[nodes] != UNEXPLORATED
+
+    def explorated_count(self) -> int:
+        """ Get the number of explorated nodes (the start node is not included) """
+        return self._explorated_count
 
     def calc_cost_path(self, path: list) -> float:
         """ Calculate the complete cost of a path 
@@ -62,18 +176,13 @@ class World(object):
         :path: The path
         :returns: The cost of path
         """
-        cost = 0
-        n = len(path)
-        for i in range(n - 1):
-            cost += self.cost(path[i], path[i + 1])
-
-        return cost
+        return self._graph.path_cost(path)
 
     def size(self) -> int:
         """ Get the size of the world """
-        return nx.number_of_nodes(self._map)
+        return self._graph.number_of_nodes()
 
-    def cost(self, node_1, node_2) -> int:
+    def cost(self, node_1, node_2) -> float:
         """ Get the cost between two nodes
 
         :node_1: Node id
@@ -81,7 +190,7 @@ class World(object):
         :returns: The cost
 
         """
-        return self._map[node_1][node_2]["weight"]
+        return self._graph.cost(node_1, node_2)
 
     def get_agents_numbers(self, node):
         """ Get the number of agents and a given node
@@ -90,83 +199,246 @@ class World(object):
         :returns: The number of agents
 
         """
-        assert 0 <= node <= nx.number_of_nodes(self._map), "Get number of agents from a non existing node"
-        ret = self._map.nodes[node].get("agents")
-        if ret is None:
-            return 0
+        return int(self._agents[node])
+
+    def occupancy(self) -> np.ndarray:
+        """ Get a copy of the number of agents at every node """
+        return self._agents.copy()
+
+    def node_states(self) -> np.ndarray:
+        """ Get a copy of the state (color) of every node """
+        return self._state.copy()
+
+    def get_agents_many(self, nodes) -> np.ndarray:
+        """ Get the number of agents at nodes
+
+        :nodes: Array of node ids
+        :returns: The number of agents at each node
+
+        """
+        return self._agents[nodes]
 
-        return ret
+    def set_agents_many(self, nodes, agents) -> None:
+        """ Set the number of agents at nodes
+
+        :nodes: The node ids
+        :agents: The number of agents at each node (or a single number for all)
+
+        """
+        self._agents[np.asarray(nodes, dtype=np.int64)] = agents
 
     def update_value(self, node: int, key: str, value):
         """ Update a value on a node
 
+            The color and agents keys are stored in the state arrays, all
+            other keys are stored on the navigation map.
+
         :node: The node id
         :key: The key 
         :value: The value to assign
 
         """
         node = int(node)
-        assert 0 <= node <= nx.number_of_nodes(self._map), "Updating value on a non existing node"
-        self._map.nodes[node][key] = value
+        assert 0 <= node < self.size(), "Updating value on a non existing node"
+        if key == "color":
+            value = int(value)
+            self._explorated_count += int(value == EXPLORATED) - int(self._state[node] == EXPLORATED)
+            self._state[node] = value
+        elif key == "agents":
+            self._agents[node] = value
+        else:
+            self._map.nodes[node][key] = value
+
+    def _node_labels(self, node_id: bool) -> np.ndarray:
+        """ Get the labels of the nodes used when drawing
 
-    def view(self, block=True, node_id=False, color_map=ClassicColor()):
-        """ Show the world """
-        color = self._map.nodes(data="color", default=UNEXPLORATED)
-        color = [color_map(c) for _, c in color]
+        :node_id: Label with the node id instead of the number of agents
+        :returns: The labels
 
+        """
         if node_id:
-            agents = self._map.nodes(data="agents", default=0)
-            agents = {n: n for n, _ in agents}
-        else:
-            agents = self._map.nodes(data="agents", default=0)
-            agents = {n: a for n, a in agents}
+            return np.arange(self.size())
 
-        pos = graphviz_layout(self._map, prog='neato')
-        nx.draw_networkx(self._map, pos=pos, node_color=color, labels=agents)
-        nx.draw_networkx_edge_labels(self._map, pos=pos,
-                                     edge_labels=self._labels)
+        return self._agents
 
-    def view_fully_connected(self, block=True, node_id=False, color_map=ClassicColor()):
-        """ Show the  fully connectd world """
-        color = self._connected_map.nodes(data="color", default=UNEXPLORATED)
-        color = [color_map(c) for _, c in color]
+    def layout(self) -> dict:
+        """ Get the position of the nodes when drawing the current map
 
-        if node_id:
-            agents = self._connected_map.nodes(data="agents", default=0)
-            agents = {n: n for n, _ in agents}
+            The layout is computed once for each map type and cached.
+
+        :returns: The position of each node
+
+        """
+        if self._map_type not in self._layouts:
+            graph = self._map if self._map_type == "nav" else self.full_connected()
+            self._layouts[self._map_type] = graphviz_layout(graph, prog='neato')
+
+        return self._layouts[self._map_type]
+
+    def drawing(self) -> tuple:
+        """ Get what is needed to draw the current map
+
+        :returns: The graph, the position of each node, the edge labels and the map type
+
+        """
+        if self._map_type == "nav":
+            graph, labels = self._map, self._labels
         else:
-            agents = self._connected_map.nodes(data="agents", default=0)
-            agents = {n: a for n, a in agents}
+            graph, labels = self.full_connected(), self._connected_labels
+
+        return graph, self.layout(), labels, self._map_type
+
+    def view(self, block=True, node_id=False, color_map=ClassicColor(), title=None):
+        """ Show the world
+
+            The world is drawn once in the current figure, later calls only
+            update the node colors, node labels and title in place.
+
+        :title: The title of the figure (None to keep it)
+
+        """
+        import matplotlib.pyplot as plt
+        from .view import WorldView
+
+        fig = plt.gcf()
+        if self._view is None or not self._view.valid(fig, self._map_type):
+            if self._view is not None:
+                self._view.close()
+
+            self._view = WorldView(fig, *self.drawing())
+
+        self._view.update(self._state, self._node_labels(node_id), color_map, title)
 
-        pos = graphviz_layout(self._connected_map, prog='neato')
-        nx.draw_networkx(self._connected_map, pos=pos,
-                         node_color=color, labels=agents)
-        nx.draw_networkx_edge_labels(self._connected_map, pos=pos,
-                                     edge_labels=self._connected_labels)
+    def view_fully_connected(self, block=True, node_id=False, color_map=ClassicColor(), title=None):
+        """ Show the  fully connectd world """
+        if self._map_type == "nav":
+            self.switch()
+            self.view(block, node_id, color_map, title)
+            self.switch()
+        else:
+            self.view(block, node_id, color_map, title)
 
     def switch(self):
-        """ Switch between fully connected and navigation map """
-        if self._connected_map is None:
-            self.full_connected()
+        """ Switch between fully connected and navigation map
 
+            The fully connected map is a virtual view served from the
+            distance matrix, so no edges are materialized when switching.
+        """
         if self._map_type == "nav":
-            self._map = self._connected_map
+            self._graph = self._closure
             self._map_type = "full"
         else:
-            self._map = self._nav_map
+            self._graph = self._nav_csr
             self._map_type = "nav"
 
-    def full_connected(self):
-        """ Make the map fully connected. """
-        G = self._map.copy()
+    def set_distance_cache(self, cache) -> None:
+        """ Set the on-disk cache used for the shortest path matrices
+
+        :cache: The DistanceCache or None to disable caching
+
+        """
+        self._distance_cache = cache
+
+    def distances(self) -> np.ndarray:
+        """ Get the shortest path distance matrix of the navigation map
+
+            It is calculated once without the predecessors, or loaded from
+            the distance cache if it is set.
+
+        :returns: The distance matrix
+
+        """
+        if self._distances is None:
+            self._distances = self._cached(DistanceCache.DISTANCES)
+        if self._distances is None:
+            logging.debug("Calculating all pairs shortest distances")
+            self._distances, _ = all_pairs_shortest_paths(self._nav_csr, predecessors=False)
+            self._store(DistanceCache.DISTANCES, self._distances)
+
+        return self._distances
+
+    def predecessors(self) -> np.ndarray:
+        """ Get the shortest path predecessor matrix of the navigation map
 
-        for n in G.nodes:
-            for c in nx.non_neighbors(G, n):
-                path = nx.shortest_path(self._map, source=n,
-                                        target=c, weight="weight")
+            It is only calculated (or loaded from the distance cache) when
+            a path is needed.
 
-                G.add_edge(n, c)
-                G[n][c]["weight"] = self.calc_cost_path(path)
+        :returns: The predecessor matrix
+
+        """
+        if self._predecessors is None:
+            self._predecessors = self._cached(DistanceCache.PREDECESSORS)
+        if self._predecessors is None:
+            logging.debug("Calculating all pairs shortest paths")
+            distances, self._predecessors = all_pairs_shortest_paths(self._nav_csr)
+            self._store(DistanceCache.PREDECESSORS, self._predecessors)
+            if self._distances is None:
+                self._distances = distances
+                self._store(DistanceCache.DISTANCES, distances)
+
+        return self._predecessors
+
+    def shortest_paths(self):
+        """ Get the shortest path distance and predecessor matrices of the navigation map
+
+        :returns: The distance matrix and predecessor matrix
+
+        """
+        return self.distances(), self.predecessors()
+
+    def shortest_path(self, source: int, target: int) -> list:
+        """ Get the shortest path between two nodes in the navigation map
+
+        :source: The start node
+        :target: The end node
+        :returns: The nodes along the path
+
+        """
+        return reconstruct_path(self.predecessors(), source, target)
+
+    def _cached(self, kind: str):
+        """ Load a matrix from the distance cache
+
+        :kind: The matrix (see DistanceCache)
+        :returns: The matrix or None if it is not cached
+
+        """
+        if self._distance_cache is None:
+            return None
+
+        return self._distance_cache.load(self._distance_cache.key(self._nav_csr), kind)
+
+    def _store(self, kind: str, matrix: np.ndarray) -> None:
+        """ Store a matrix in the distance cache, if it is set
+
+        :kind: The matrix (see DistanceCache)
+        :matrix: The matrix
+
+        """
+        if self._distance_cache is not None:
+            self._distance_cache.store(self._distance_cache.key(self._nav_csr), kind, matrix)
+
+    def full_connected(self) -> nx.Graph:
+        """ Get the fully connected map as a networkx graph
+
+            The cost between two nodes is the cost of the shortest path
+            between them in the navigation map. The graph contains n^2
+            edges and is only meant for drawing and solving TSP, it is
+            built on the first call.
+
+        :returns: The fully connected map
+
+        """
+        if self._connected_map is not None:
+            return self._connected_map
+
+        distances = self.distances()
+
+        G = nx.Graph()
+        G.add_nodes_from(self._nav_map.nodes(data=True))
+        rows, columns = np.triu_indices(len(distances), 1)
+        G.add_weighted_edges_from(zip(rows.tolist(), columns.tolist(),
+                                      distances[rows, columns].tolist()))
 
         self._connected_labels = {}
         for edge in nx.edges(G):
@@ -174,3 +446,5 @@ class World(object):
             self._connected_labels[edge] = G[i][j]["weight"]
 
         self._connected_map = G
+
+        return G